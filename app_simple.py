@@ -1,29 +1,88 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort
+import os
 import re
+import random
 import logging
+import math
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
 
-from validators import UserRequest, AITriage, APIError  # pain_level & notes included
-from safety import has_red_flag
+from validators import UserRequest, SessionDelta, AITriage, APIError  # pain_level & notes included
+from safety import match_red_flags, RED_FLAGS, CASUAL_HINTS
+from fuzzy_match import FuzzyMatcher
+from lexicon import COMMON_WORDS
 from dosing_rules import compute_conservative_dose
-from openai_client import get_ai_pharmacist_recommendation
+from openai_client import (
+    get_ai_pharmacist_recommendation, get_ai_pharmacist_recommendation_async,
+    get_ai_pharmacist_followup_async, build_patient_messages,
+)
+from otc_ranking import CatalogIndex
+from catalog_records import CatalogRecord, DEFAULT_SIDE_EFFECTS, compile_catalog
+from local_model import LocalDecisionModel, log_decision
+import metrics
+from static_assets import AssetStore
+from response_shaping import ReferenceTable, shape, json_response
+from deadlines import Deadline, DeadlineExceeded, ClientDisconnected, client_disconnected, run_cancellable
+from intake_timeline import IntakeTimeline
+from ttl_cache import TTLCache
+from sessions import Session
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Serve the SPA from /public (with basic CORS support)
 # ──────────────────────────────────────────────────────────────────────────────
-app = Flask(__name__, static_folder="public", static_url_path="")
+app = Flask(__name__, static_folder=None)
 
-# Simple CORS headers for development
+# Read, hashed and precompressed once at startup; see static_assets.py
+ASSETS = AssetStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "public"))
+STATIC_ENDPOINTS = {"index", "static_asset"}
+
+# Simple CORS headers for development (API responses only)
 @app.after_request
 def after_request(response):
+    if request.endpoint in STATIC_ENDPOINTS:
+        return response
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+# ─────────────────── Deadlines & cancellation ───────────────────
+# Per-request budget; clients may ask for less via the X-Request-Timeout-Ms header.
+REQUEST_DEADLINE_MS = int(os.getenv("REQUEST_DEADLINE_MS", "30000"))
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    metrics.incr("requests_cancelled_deadline")
+    return jsonify(APIError(error=f"Request timed out: {e}").model_dump()), 504
+
+@app.errorhandler(ClientDisconnected)
+def client_gone(e):
+    metrics.incr("requests_cancelled_disconnect")
+    return "", 499  # nginx convention; nobody is listening anymore
+
+def ensure_live(deadline:Deadline):
+    """Stop work once the deadline passed or the client went away."""
+    deadline.check()
+    if client_disconnected(request.environ):
+        raise ClientDisconnected("client closed the connection")
+
 # ─────────────────── Optional: serve SPA ───────────────────
 @app.route("/")
 def index():
-    return app.send_static_file("index.html")
+    asset = ASSETS.find_index()
+    if asset is None:
+        abort(404)
+    return ASSETS.serve(asset, headers=request.headers)
+
+def static_asset(filename):
+    return ASSETS.serve(ASSETS.lookup(filename), headers=request.headers)
+
+# One GET rule per file rather than a catch-all, so a GET to an API route still gets its 405
+for _name in ASSETS.names():
+    app.add_url_rule(f"/{_name}", "static_asset", static_asset, methods=["GET"], defaults={"filename": _name})
 
 @app.route("/health", methods=["GET"])
 def health():
@@ -40,6 +99,14 @@ def health():
     
     return {"ok": True, "ai_pharmacist_ok": ai_ok}
 
+@app.route("/metrics", methods=["GET"])
+def metrics_report():
+    return {
+        "counters": metrics.snapshot(),
+        "ai_skip_rate": metrics.ratio("ai_skipped", "ai_gate_decisions"),
+        "ai_shadow_agreement_rate": metrics.ratio("ai_shadow_agreements", "ai_shadow_compared"),
+    }
+
 # ─────────────────── OTC catalog (import/fallback) ───────────────────
 try:
     from otc_catalog import OTC, OTC_ORDER
@@ -53,6 +120,7 @@ except ImportError:
         "acetaminophen": {
             "brands": ["Tylenol", "Equate Acetaminophen"],
             "generic": "Acetaminophen",
+            "therapeutic_class": "analgesic",
             "form": "tablet",
             "unit_mg": 500,
             "single_dose_cap_mg": 1000,
@@ -65,6 +133,7 @@ except ImportError:
         "ibuprofen": {
             "brands": ["Advil", "Motrin"],
             "generic": "Ibuprofen",
+            "therapeutic_class": "nsaid",
             "form": "tablet",
             "unit_mg": 200,
             "single_dose_cap_mg": 800,
@@ -77,6 +146,7 @@ except ImportError:
         "dextromethorphan": {
             "brands": ["Delsym", "Robitussin"],
             "generic": "Dextromethorphan",
+            "therapeutic_class": "antitussive",
             "form": "liquid",
             "mg_per_ml": 6,  # 30 mg per 5 mL
             "single_dose_cap_mg": 60,
@@ -89,6 +159,7 @@ except ImportError:
         "guaifenesin": {
             "brands": ["Mucinex", "Robitussin Chest Congestion"],
             "generic": "Guaifenesin",
+            "therapeutic_class": "expectorant",
             "form": "tablet",
             "unit_mg": 200,
             "single_dose_cap_mg": 600,
@@ -101,6 +172,7 @@ except ImportError:
         "cetirizine": {
             "brands": ["Zyrtec"],
             "generic": "Cetirizine",
+            "therapeutic_class": "antihistamine",
             "form": "tablet",
             "unit_mg": 10,
             "single_dose_cap_mg": 10,
@@ -113,6 +185,7 @@ except ImportError:
         "loratadine": {
             "brands": ["Claritin"],
             "generic": "Loratadine",
+            "therapeutic_class": "antihistamine",
             "form": "tablet",
             "unit_mg": 10,
             "single_dose_cap_mg": 10,
@@ -125,6 +198,7 @@ except ImportError:
         "famotidine": {
             "brands": ["Pepcid"],
             "generic": "Famotidine",
+            "therapeutic_class": "acid_reducer",
             "form": "tablet",
             "unit_mg": 10,
             "single_dose_cap_mg": 20,
@@ -137,6 +211,7 @@ except ImportError:
         "meclizine": {
             "brands": ["Dramamine Less Drowsy", "Bonine"],
             "generic": "Meclizine",
+            "therapeutic_class": "antiemetic",
             "form": "tablet",
             "unit_mg": 25,
             "single_dose_cap_mg": 25,
@@ -149,6 +224,7 @@ except ImportError:
         "calcium_carbonate": {
             "brands": ["Tums"],
             "generic": "Calcium Carbonate",
+            "therapeutic_class": "acid_reducer",
             "form": "tablet",
             "unit_mg": 500,
             "single_dose_cap_mg": 1000,
@@ -173,16 +249,75 @@ NAME_ALIASES = {
     "calcium_carbonate": ["calcium carbonate", "tums"],
 }
 
+# Typo-tolerant alias lookup for notes ("tylenl 2 hours ago"); symptom, red-flag and everyday
+# words are real words, never misspelt drug names. Aliases of 4 letters or fewer ("tums", "dm")
+# must be spelt exactly, or "gums" would read as tums.
+ALIAS_TO_KEY = {name: key for key, aliases in NAME_ALIASES.items() for name in aliases}
+ALIAS_MATCHER = FuzzyMatcher(
+    ALIAS_TO_KEY,
+    known_words=[s for meta in OTC.values() for s in meta.get("symptoms", [])] + sorted(RED_FLAGS)
+                + sorted(CASUAL_HINTS) + sorted(COMMON_WORDS),
+    min_fuzzy_len=5,
+)
+
+CATALOG = compile_catalog(OTC, OTC_ORDER)  # immutable records, shared across requests
+CATALOG_INDEX = CatalogIndex(CATALOG)
+SHORTLIST_SIZE = 3  # candidates forwarded to the AI pharmacist
+
+# ───────────────────────── Local decision model (optional) ─────────────────────────
+# Trained offline with `python local_model.py train <AI_DECISION_LOG>`; confident
+# predictions skip the AI pharmacist round-trip.
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH")
+LOCAL_MODEL_THRESHOLD = float(os.getenv("LOCAL_MODEL_THRESHOLD", "0.9"))
+AI_DECISION_LOG = os.getenv("AI_DECISION_LOG")  # JSONL of (request, AI drug_key) pairs
+
+# ───────────────────────── Intake timeline ─────────────────────────
+# Doses accumulate across requests only in a server-issued session (see SESSIONS); a dose
+# read from notes within NOTES_DEDUP_WINDOW_S of a recorded one is the same dose.
+NOTES_DEDUP_WINDOW_S = 3600
+
+# ───────────────────────── Sessions ─────────────────────────
+# POST /sessions keeps the validated profile, intake timeline, rule results and the AI
+# exchange server-side; follow-ups send only what changed. Only ids issued here are accepted,
+# so clients can't pick an id and read or add to someone else's intake history.
+SESSIONS = TTLCache(
+    maxsize=int(os.getenv("SESSIONS_MAX", "10000")),
+    ttl_s=float(os.getenv("SESSION_TTL_S", "7200")),
+)
+
+# ───────────────────────── AI gating ─────────────────────────
+# Skip the AI pharmacist when the rule engine's winner leads every other therapeutic class
+# by at least AI_SKIP_MARGIN symptom matches and nothing complicates the case. A sample of
+# skipped requests is still sent to the AI in the background to measure agreement; at most
+# AI_SHADOW_MAX_IN_FLIGHT such calls run at once and samples beyond that are dropped.
+AI_SKIP_MARGIN = int(os.getenv("AI_SKIP_MARGIN", "1"))
+AI_SHADOW_SAMPLE_RATE = float(os.getenv("AI_SHADOW_SAMPLE_RATE", "0"))
+AI_SHADOW_MAX_IN_FLIGHT = max(1, int(os.getenv("AI_SHADOW_MAX_IN_FLIGHT", "2")))
+_SHADOW_POOL = ThreadPoolExecutor(max_workers=AI_SHADOW_MAX_IN_FLIGHT, thread_name_prefix="ai-shadow")
+_SHADOW_SLOTS = threading.BoundedSemaphore(AI_SHADOW_MAX_IN_FLIGHT)
+
+LOCAL_MODEL = None
+if LOCAL_MODEL_PATH:
+    try:
+        LOCAL_MODEL = LocalDecisionModel.load(LOCAL_MODEL_PATH)
+    except Exception as e:
+        logging.warning(f"Local decision model not loaded from {LOCAL_MODEL_PATH}: {e}")
+
 WORD_TO_INT = {"one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8,"nine":9,"ten":10,"eleven":11,"twelve":12}
 NO_RELIEF_RE = re.compile(r"(no\s*(relief|difference|effect)|did(?:n['']t| not)\s*(work|help)|not\s*helping|ineffective|still\s*(in\s*pain|cough(ing)?))", re.I)
+TOOK_RE = re.compile(r"\b(took|taken|taking)\b", re.I)
 
-def _parse_hours_ago(text:str):
-    m = re.search(r"\b(\d+|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\s*(hour|hr|hrs|hours)\s*(ago|back)?\b", text or "", flags=re.I)
-    if not m: return None
-    raw = m.group(1).lower()
+HOURS_AGO_PATTERN = r"\b(\d+|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\s*(?:hour|hr|hrs|hours)\s*(?:ago|back)?\b"
+
+def _hours_value(raw:str):
+    raw = raw.lower()
     try: return int(raw)
     except ValueError: return WORD_TO_INT.get(raw)
 
+def _parse_hours_ago(text:str):
+    m = re.search(HOURS_AGO_PATTERN, text or "", flags=re.I)
+    return _hours_value(m.group(1)) if m else None
+
 def detect_recent_medication(notes:str):
     if not notes: return None, None, False
     txt = notes.lower()
@@ -192,8 +327,71 @@ def detect_recent_medication(notes:str):
     for key, aliases in NAME_ALIASES.items():
         if any(name in txt for name in aliases):
             drug_key = key; break
+    if drug_key is None:
+        matches = ALIAS_MATCHER.find(txt)
+        if matches: drug_key = ALIAS_TO_KEY[matches[0].term]
     return drug_key, hours_ago, no_relief
 
+# Word-level scan of the notes for drug mentions, "400mg" amounts and "2 hours ago" times
+ALIAS_FIRST_WORDS = {alias.split()[0] for alias in ALIAS_TO_KEY}
+ALIAS_MAX_WORDS = max(len(alias.split()) for alias in ALIAS_TO_KEY)
+HOUR_WORDS = {"hour", "hr", "hrs", "hours"}
+MG_WORD_RE = re.compile(r"(\d+)mg")
+INTAKE_TRIGGER_WORDS = ALIAS_FIRST_WORDS | set(WORD_TO_INT)
+
+def _number(word:str):
+    return int(word) if word.isdigit() else WORD_TO_INT.get(word)
+
+def parse_intake_notes(notes:str):
+    """
+    [(drug_key, mg, hours_ago)] for every drug mentioned in free-text notes. An amount or
+    time belongs to the drug it follows ("advil 400mg 3 hours ago"), or to the next drug
+    when it comes first ("3 hours ago I took advil"); missing values are None.
+    """
+    words = ALIAS_MATCHER.correct_words(notes)
+    words.append("")  # sentinel so words[i + 1] always exists
+    entries, pending = [], {}
+    consumed = 0
+    # Only drug names and numbers can start a match; visit just those positions
+    triggers = {w for w in set(words) if w in INTAKE_TRIGGER_WORDS or w[:1].isdigit()}
+    for i in [i for i, w in enumerate(words) if w in triggers]:
+        if i < consumed:
+            continue
+        word, nxt = words[i], words[i + 1]
+        if word in ALIAS_FIRST_WORDS:
+            for n in range(ALIAS_MAX_WORDS, 0, -1):  # longest alias wins
+                key = ALIAS_TO_KEY.get(" ".join(words[i:i + n]))
+                if key:
+                    entries.append([key, pending.pop(1, None), pending.pop(2, None)])
+                    consumed = i + n
+                    break
+            continue
+        number = _number(word)
+        if number is None and MG_WORD_RE.fullmatch(word):
+            slot, value = 1, float(word[:-2])
+        elif number is not None and nxt == "mg":
+            slot, value = 1, float(number)
+        elif number is not None and nxt in HOUR_WORDS:
+            slot, value = 2, number
+        else:
+            continue
+        consumed = i + 1 if number is None else i + 2
+        if entries and entries[-1][slot] is None:
+            entries[-1][slot] = value
+        else:
+            pending[slot] = value
+    return [tuple(e) for e in entries]
+
+def resolve_drug_key(name:str):
+    """Catalog key for a generic, brand or (misspelt) alias; None if unknown."""
+    name = (name or "").strip().lower()
+    if name in CATALOG:
+        return name
+    if name in ALIAS_TO_KEY:
+        return ALIAS_TO_KEY[name]
+    matches = ALIAS_MATCHER.find(name)
+    return ALIAS_TO_KEY[matches[0].term] if matches else None
+
 def validate_dose_safety(drug_key: str, suggested_mg: int, age: int, weight_kg: float, conditions: list) -> tuple[bool, str, int]:
     """
     Comprehensive dose safety validation with multiple checks
@@ -294,38 +492,125 @@ def suggest_alternative_medication(symptoms: list, allergies: list, conditions:
     
     return alternatives
 
-def select_otc(symptoms, allergies, conditions, pain_level=None, notes:str="")->dict:
-    s = " ".join((symptoms or [])).lower()
-    a = " ".join((allergies or [])).lower()
-    c = " ".join((conditions or [])).lower()
+def recent_dose_exclusions(recent_key, hours_ago, no_relief) -> set:
+    """The recently taken drug is ruled out if it didn't help or its dosing interval hasn't passed."""
+    recent_min_interval = CATALOG[recent_key].frequency_hours if recent_key in CATALOG else None
+    if recent_key and (no_relief or (hours_ago is not None and recent_min_interval and hours_ago < recent_min_interval)):
+        return {recent_key}
+    return set()
+
+def min_dose_mg(record:CatalogRecord)->float:
+    """Smallest dose worth taking: one tablet, or the single-dose cap for liquids."""
+    return record.unit_mg or record.single_dose_cap_mg
+
+def build_intake_timeline(payload:UserRequest, now:float, timeline:IntakeTimeline=None)->IntakeTimeline:
+    """
+    The patient's intake timeline (the given session timeline, else a new one) plus this
+    request's doses. Structured `intake` entries are used as given; otherwise doses
+    are read from the notes, deduplicated so a resent note doesn't count the same dose twice.
+    """
+    if timeline is None:
+        timeline = IntakeTimeline()
+    if payload.intake:
+        for entry in payload.intake:
+            key = resolve_drug_key(entry.drug)
+            if key is None:
+                continue
+            taken_at = entry.taken_at if entry.taken_at.tzinfo else entry.taken_at.replace(tzinfo=timezone.utc)
+            mg = entry.mg if entry.mg is not None else CATALOG[key].single_dose_cap_mg
+            timeline.add(key, mg, taken_at.timestamp(), assumed=entry.mg is None)
+    else:
+        for key, mg, hours_ago in parse_intake_notes(payload.notes or ""):
+            if hours_ago is None:
+                continue
+            timeline.add(key, mg if mg is not None else CATALOG[key].single_dose_cap_mg, now - hours_ago * 3600,
+                         dedup_window_s=NOTES_DEDUP_WINDOW_S, assumed=mg is None)
+    return timeline
 
+def timeline_exclusions(timeline:IntakeTimeline, now:float)->set:
+    """Drugs that can't be taken now: the dosing interval or the 24-hour maximum would be exceeded."""
+    blocked = set()
+    for key in timeline.recent_drugs(now):
+        record = CATALOG.get(key)
+        if record and timeline.next_allowed(key, now, record.frequency_hours, record.max_daily_mg, min_dose_mg(record)) > now:
+            blocked.add(key)
+    return blocked
+
+def rank_otc(symptoms, allergies, conditions, pain_level=None, notes:str="", k:int=SHORTLIST_SIZE, exclude=()):
+    """Top-k shortlist and winning margin (see CatalogIndex.rank_with_margin)."""
     recent_key, hours_ago, no_relief = detect_recent_medication(notes)
-    recent_min_interval = OTC.get(recent_key, {}).get("frequency_hours") if recent_key else None
+    exclude = recent_dose_exclusions(recent_key, hours_ago, no_relief) | set(exclude)
+    boosts = {}
+    if pain_level is not None and pain_level >= 7:
+        boosts["ibuprofen"] = boosts.get("ibuprofen", 0) + 2
+    if no_relief and recent_key == "acetaminophen":
+        boosts["ibuprofen"] = boosts.get("ibuprofen", 0) + 2
 
-    best_key, best_score = None, -10_000
-    for key in OTC_ORDER:
-        meta = OTC[key]
-        if (meta["generic"].lower() in a) or any(b.lower() in a for b in meta["brands"]):
-            continue
-        if any(term in c for term in meta.get("avoid_if", [])):
-            continue
-        if recent_key == key and (no_relief or (hours_ago is not None and recent_min_interval and hours_ago < recent_min_interval)):
-            continue
-        score = sum(1 for kw in meta["symptoms"] if kw in s)
-        if pain_level is not None and pain_level >= 7 and key == "ibuprofen":
-            score += 2
-        if no_relief and recent_key == "acetaminophen" and key == "ibuprofen":
-            score += 2
-        if no_relief and recent_key == key:
-            score -= 5
-        if score > best_score:
-            best_score, best_key = score, key
-
-    if not best_key:
-        best_key = "acetaminophen"
-    choice = {"key": best_key, **OTC[best_key]}
-    choice["brand"] = choice["brands"][0]
-    return choice
+    return CATALOG_INDEX.rank_with_margin(symptoms, allergies, conditions, boosts=boosts, exclude=exclude, k=k)
+
+def catalog_choice(drug_key:str)->CatalogRecord:
+    return CATALOG[drug_key]
+
+def choice_from_shortlist(shortlist)->CatalogRecord:
+    return catalog_choice(shortlist[0].key if shortlist else "acetaminophen")
+
+def local_model_choice(request_data:dict, exclude=()):
+    """
+    Drug key from the local decision model when it is confident and the drug is not
+    ruled out by allergies, contraindications, a recent dose or `exclude`; otherwise None.
+    """
+    if LOCAL_MODEL is None:
+        return None
+    key, prob = LOCAL_MODEL.predict(request_data)
+    if key not in CATALOG or prob < LOCAL_MODEL_THRESHOLD:
+        return None
+    blocked = CATALOG_INDEX.excluded(request_data.get("allergies"), request_data.get("conditions"))
+    blocked |= recent_dose_exclusions(*detect_recent_medication(request_data.get("notes") or ""))
+    blocked |= set(exclude)
+    return None if key in blocked else key
+
+def select_otc(symptoms, allergies, conditions, pain_level=None, notes:str="", return_margin:bool=False):
+    ranking = rank_otc(symptoms, allergies, conditions, pain_level=pain_level, notes=notes)
+    choice = choice_from_shortlist(ranking.shortlist)
+    return (choice, ranking.margin) if return_margin else choice
+
+def ai_gate_skips(margin:int, payload:UserRequest, recent_intake=())->bool:
+    """True when the rule engine's choice is unambiguous and the patient has no complicating factors."""
+    if margin <= 0 or margin < AI_SKIP_MARGIN:
+        return False
+    if recent_intake:
+        return False
+    if payload.conditions:
+        return False
+    if payload.pain_level is not None and payload.pain_level >= 8:
+        return False
+    if payload.age is None or payload.age < 12 or payload.age >= 65:
+        return False
+    recent_key, _, _ = detect_recent_medication(payload.notes or "")
+    return recent_key is None
+
+def _shadow_ai_check(request_json:dict, candidates, rule_key:str):
+    """Background AI call for a gated request; records whether the AI would have agreed."""
+    try:
+        rec = get_ai_pharmacist_recommendation(request_json, candidates=candidates, timeout=REQUEST_DEADLINE_MS / 1000.0)
+    except Exception:
+        rec = None
+    if not rec:
+        metrics.incr("ai_shadow_failures")
+        return
+    metrics.incr("ai_shadow_compared")
+    agreed = rec["selected_medication"].get("drug_key") == rule_key
+    metrics.incr("ai_shadow_agreements" if agreed else "ai_shadow_disagreements")
+
+def submit_shadow_ai_check(request_json:dict, candidates, rule_key:str) -> bool:
+    """Queue a shadow AI check unless AI_SHADOW_MAX_IN_FLIGHT are already running; then the sample is dropped."""
+    if not _SHADOW_SLOTS.acquire(blocking=False):
+        metrics.incr("ai_shadow_dropped")
+        return False
+    metrics.incr("ai_shadow_calls")
+    future = _SHADOW_POOL.submit(_shadow_ai_check, request_json, candidates, rule_key)
+    future.add_done_callback(lambda _: _SHADOW_SLOTS.release())
+    return True
 
 def format_tablet_dose(total_mg:int, unit_mg:int):
     units = max(1, round(total_mg / unit_mg)) if unit_mg>0 else 1
@@ -337,59 +622,168 @@ def format_liquid_dose(total_mg:int, mg_per_ml:float):
     confirmed = round(ml * mg_per_ml)
     return f"{ml} mL (≈{confirmed}mg)", ml, confirmed
 
-def build_timing_advice(notes:str):
+def build_timing_advice(notes:str, timeline:IntakeTimeline=None, now:float=None):
+    if timeline is not None:
+        now = time.time() if now is None else now
+        recent = timeline.recent_drugs(now)
+        if recent:
+            return _timeline_timing_advice(timeline, recent, now, notes)
     rk, hours_ago, no_relief = detect_recent_medication(notes or "")
     if not rk: return None
-    meta = OTC.get(rk);  min_int = meta.get("frequency_hours"); brand = meta["brands"][0]
-    parts = [f"You reported taking {brand} ({meta['generic']}) " + (f"about {hours_ago} hour(s) ago." if hours_ago is not None else "recently.")]
+    meta = CATALOG[rk];  min_int = meta.frequency_hours
+    parts = [f"You reported taking {meta.display_name} " + (f"about {hours_ago} hour(s) ago." if hours_ago is not None else "recently.")]
     if no_relief: parts.append("You also reported little or no relief.")
     if min_int and hours_ago is not None and hours_ago < min_int:
         wait = max(0, min_int - hours_ago)
         parts.append(f"Wait at least {wait} more hour(s) before another dose of that same medication.")
     return " ".join(parts)
 
+def intake_amount_text(timeline:IntakeTimeline, key:str, now:float)->str:
+    """
+    What the patient took in the last 24 hours. Doses reported without an amount count as a
+    full dose for the limits; the text says so instead of presenting that figure as fact.
+    """
+    meta = CATALOG[key]
+    taken, assumed = timeline.mg_last_24h(key, now), timeline.mg_assumed_last_24h(key, now)
+    if not assumed:
+        return f"You have taken about {taken:g}mg of {meta.display_name} in the last 24 hours"
+    if assumed >= taken:
+        return (f"You have taken {meta.display_name} in the last 24 hours; no amount was given, "
+                f"so dose limits assume a full dose ({meta.single_dose_cap_mg}mg) each time")
+    return (f"You have taken about {taken:g}mg of {meta.display_name} in the last 24 hours, "
+            f"assuming a full dose ({meta.single_dose_cap_mg}mg) where no amount was given")
+
+def _timeline_timing_advice(timeline:IntakeTimeline, drug_keys, now:float, notes:str):
+    parts = []
+    for key in drug_keys:
+        meta = CATALOG.get(key)
+        if meta is None: continue
+        hours_ago = (now - timeline.last_dose(key, now)) / 3600
+        parts.append(f"{intake_amount_text(timeline, key, now)} (last dose about {hours_ago:.0f} hour(s) ago).")
+        next_at = timeline.next_allowed(key, now, meta.frequency_hours, meta.max_daily_mg, min_dose_mg(meta))
+        if math.isinf(next_at):
+            parts.append("Do not take more of it today.")
+        elif next_at > now:
+            parts.append(f"Wait at least {math.ceil((next_at - now) / 3600)} more hour(s) before another dose of it.")
+    if NO_RELIEF_RE.search(notes or ""):
+        parts.append("You also reported little or no relief.")
+    return " ".join(parts) or None
+
+# ───────────────────────── Static response text ─────────────────────────
+MEDICAL_DISCLAIMER = (
+    "IMPORTANT: AbsorpGen AI is a proof-of-concept and not a substitute for professional medical advice. "
+    "Always consult a qualified clinician for diagnosis and treatment."
+)
+DOSE_POLICY = "AI PHARMACIST: Intelligent medication selection + comprehensive safety validation + hard OTC caps"
+
+# Referenced by id in ?profile=compact responses; clients fetch /references once
+REFERENCES = ReferenceTable()
+REFERENCES.add("medical_disclaimer/v1", MEDICAL_DISCLAIMER)
+REFERENCES.add("policy/v1", DOSE_POLICY)
+REFERENCES.add("side_effects/default/v1", DEFAULT_SIDE_EFFECTS)
+for _record in CATALOG.values():
+    if REFERENCES.ref_for(_record.side_effects) is None:
+        REFERENCES.add(f"side_effects/{_record.key}/v1", _record.side_effects)
+
+@app.route("/references", methods=["GET"])
+def references():
+    etag = REFERENCES.etag
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("If-None-Match") == etag:
+        return "", 304, headers
+    resp = json_response(REFERENCES.as_dict(), request.headers.get("Accept-Encoding"))
+    resp.headers.update(headers)
+    return resp
+
 # ───────────────────────── API: Recommendation ─────────────────────────
 @app.route("/recommend", methods=["POST", "OPTIONS"])
 def recommend():
     if request.method == "OPTIONS":
         return "", 200
+    deadline = Deadline.from_headers(request.headers, REQUEST_DEADLINE_MS)
     try:
         payload = UserRequest(**(request.get_json(force=True)))
     except Exception as e:
         return jsonify(APIError(error=f"Invalid request: {e}").model_dump()), 400
 
-    if has_red_flag(payload.symptoms + payload.conditions):
-        triage = AITriage(
-            triage_alert="See a doctor",
-            message="One or more symptoms suggest a potentially serious condition. Please seek medical care immediately.",
-        )
-        return jsonify(triage.model_dump()), 200
+    red_flags = match_red_flags(payload.symptoms + payload.conditions)
+    if red_flags:
+        return triage_response(red_flags)
 
-    choice = select_otc(
-        payload.symptoms, payload.allergies, payload.conditions,
-        pain_level=payload.pain_level, notes=(payload.notes or "")
+    session_timeline = None
+    if payload.session_id:
+        session = SESSIONS.get(payload.session_id)
+        if session is None:
+            return jsonify(APIError(error="Unknown or expired session").model_dump()), 404
+        session_timeline = session.timeline
+
+    now = time.time()
+    timeline = build_intake_timeline(payload, now, timeline=session_timeline)
+    response = build_recommendation(payload, request.get_json(force=True), timeline, now, deadline)
+    return json_response(shape(response, request.args, REFERENCES), request.headers.get("Accept-Encoding")), 200
+
+def triage_response(red_flags):
+    triage = AITriage(
+        triage_alert="See a doctor",
+        message="One or more symptoms suggest a potentially serious condition. Please seek medical care immediately.",
+        matched_terms=red_flags,
     )
-    drug_key = choice["key"]
+    return jsonify(triage.model_dump()), 200
+
+def build_recommendation(payload:UserRequest, request_json:dict, timeline:IntakeTimeline, now:float,
+                         deadline:Deadline, session:Session=None, ai_delta:dict=None)->dict:
+    """
+    Rules, local model, AI pharmacist and dosing for an already validated, red-flag-free
+    request. With a session, stage results are reused while their inputs are unchanged
+    and the AI pharmacist continues the session's prior exchange with ai_delta.
+    """
+    def stage(name, key, compute):
+        return session.memo(name, key, compute) if session is not None else compute()
+
+    blocked = timeline_exclusions(timeline, now)
+    if session is not None:
+        blocked |= session.ineffective
+    rank_inputs = (tuple(payload.symptoms), tuple(payload.allergies), tuple(payload.conditions),
+                   payload.pain_level, payload.notes or "", frozenset(blocked))
+    ranking = stage("ranking", rank_inputs, lambda: rank_otc(
+        payload.symptoms, payload.allergies, payload.conditions,
+        pain_level=payload.pain_level, notes=(payload.notes or ""), exclude=blocked
+    ))
+    shortlist = ranking.shortlist
+    choice = choice_from_shortlist(shortlist)
+    decision_source = "rules"
+    request_data = payload.model_dump(mode="json")
+    local_key = local_model_choice(request_data, exclude=blocked)
+    if local_key:
+        choice = catalog_choice(local_key)
+        decision_source = "local_model"
+    else:
+        metrics.incr("ai_gate_decisions")
+        if ai_gate_skips(ranking.margin, payload, recent_intake=timeline.recent_drugs(now)):
+            metrics.incr("ai_skipped")
+            decision_source = "rules_gated"
+    drug_key = choice.key
 
     height = payload.height_cm or 170.0
     weight = payload.weight_kg or 70.0
-    if drug_key in {"acetaminophen", "ibuprofen"}:
-        suggested_mg = compute_conservative_dose(
-            drug_key=drug_key, height_cm=height, weight_kg=weight,
-            age=payload.age, conditions=payload.conditions,
-        )
-    else:
-        suggested_mg = choice["single_dose_cap_mg"]
+    cap = choice.single_dose_cap_mg
+    max_day = choice.max_daily_mg
 
-    cap = choice["single_dose_cap_mg"]
-    max_day = choice.get("max_daily_mg")
-    if suggested_mg > cap: suggested_mg = cap
-    if suggested_mg <= 0: suggested_mg = cap
-    
-    # DOUBLE-CHECK: Comprehensive safety validation
-    is_safe, safety_warning, validated_mg = validate_dose_safety(
-        drug_key, suggested_mg, payload.age, weight, payload.conditions or []
-    )
+    def rule_dose():
+        if drug_key in {"acetaminophen", "ibuprofen"}:
+            suggested_mg = compute_conservative_dose(
+                drug_key=drug_key, height_cm=height, weight_kg=weight,
+                age=payload.age, conditions=payload.conditions,
+            )
+        else:
+            suggested_mg = choice.single_dose_cap_mg
+        if suggested_mg > cap: suggested_mg = cap
+        if suggested_mg <= 0: suggested_mg = cap
+        # DOUBLE-CHECK: Comprehensive safety validation
+        return validate_dose_safety(drug_key, suggested_mg, payload.age, weight, payload.conditions or [])
+
+    # The profile (age, weight, conditions) is fixed within a session, so the drug is the key
+    is_safe, safety_warning, validated_mg = stage(f"dose/{drug_key}", drug_key, rule_dose)
     
     # If dose is unsafe, suggest alternatives
     alternatives = []
@@ -407,20 +801,49 @@ def recommend():
     # Ensure validated_mg is always available for fallback dosing
     final_validated_mg = validated_mg
 
-    # Try to get AI pharmacist recommendation first, with fallback to rule-based
+    # Try to get AI pharmacist recommendation first (unless the local model or the gate
+    # already decided), with fallback to rule-based
     ai_recommendation = None
+    # Only forward the shortlist when the rule engine actually matched something
+    candidates = [c.key for c in shortlist] if shortlist and shortlist[0].score > 0 else None
+    if decision_source == "rules_gated" and random.random() < AI_SHADOW_SAMPLE_RATE:
+        submit_shadow_ai_check(request_json, candidates, drug_key)
     try:
-        ai_recommendation = get_ai_pharmacist_recommendation(request.get_json(force=True))
+        if decision_source == "rules":
+            ensure_live(deadline)
+            metrics.incr("ai_called")
+            if session is not None and session.ai_messages:
+                # Follow-up: the prior exchange plus only what changed
+                metrics.incr("ai_followup_calls")
+                delta = {**(ai_delta or {}), "shortlist": candidates}
+                ai_recommendation = run_cancellable(
+                    lambda timeout: get_ai_pharmacist_followup_async(session.ai_messages, session.ai_reply, delta, timeout=timeout),
+                    deadline, is_disconnected=lambda: client_disconnected(request.environ),
+                )
+            else:
+                ai_recommendation = run_cancellable(
+                    lambda timeout: get_ai_pharmacist_recommendation_async(request_json, candidates=candidates, timeout=timeout),
+                    deadline, is_disconnected=lambda: client_disconnected(request.environ),
+                )
+                if session is not None and ai_recommendation:
+                    session.ai_messages = build_patient_messages(request_json, candidates)
+            if session is not None and ai_recommendation:
+                session.ai_reply = ai_recommendation
         if ai_recommendation:
+            decision_source = "ai"
+            if AI_DECISION_LOG:
+                try:
+                    log_decision(AI_DECISION_LOG, request_data, ai_recommendation['selected_medication']['drug_key'])
+                except OSError as e:
+                    logging.warning(f"Could not log AI decision: {e}")
             logging.info(f"AI pharmacist recommendation: {ai_recommendation['selected_medication']['reasoning']}")
             # Use AI-selected medication if different from rule-based choice
             if ai_recommendation['selected_medication']['drug_key'] != drug_key:
                 logging.info(f"AI selected {ai_recommendation['selected_medication']['drug_key']} instead of {drug_key}")
                 # Update choice to AI selection
                 ai_drug_key = ai_recommendation['selected_medication']['drug_key']
-                if ai_drug_key in OTC:
-                    choice = {"key": ai_drug_key, **OTC[ai_drug_key]}
-                    choice["brand"] = choice["brands"][0]
+                if ai_drug_key in CATALOG and ai_drug_key not in blocked:
+                    choice = catalog_choice(ai_drug_key)
                     drug_key = ai_drug_key
                     # Recalculate safety caps for new drug
                     if drug_key in {"acetaminophen", "ibuprofen"}:
@@ -429,69 +852,82 @@ def recommend():
                             age=payload.age, conditions=payload.conditions,
                         )
                     else:
-                        suggested_mg = choice["single_dose_cap_mg"]
+                        suggested_mg = choice.single_dose_cap_mg
                     # Re-validate with new drug
                     is_safe, safety_warning, validated_mg = validate_dose_safety(
                         drug_key, suggested_mg, payload.age, weight, payload.conditions or []
                     )
                     suggested_mg = validated_mg
+    except (DeadlineExceeded, ClientDisconnected):
+        raise
     except Exception as e:
         logging.warning(f"AI pharmacist failed, using rule-based fallback: {e}")
         ai_recommendation = None
+    ensure_live(deadline)
+
+    # Keep the dose within what is left of the 24-hour maximum after recorded intake
+    taken_24h = timeline.mg_last_24h(drug_key, now)
+    daily_capped = False
+    if taken_24h and choice.max_daily_mg is not None:
+        step = choice.unit_mg if choice.form == "tablet" and choice.unit_mg else 1
+        room = int((choice.max_daily_mg - taken_24h) // step * step)
+        if final_validated_mg > room:
+            final_validated_mg = max(room, 0)
+            daily_capped = True
+            is_safe = False
+            if timeline.mg_assumed_last_24h(drug_key, now):
+                note = (f"Dose reduced: about {taken_24h:g}mg taken in the last 24 hours, assuming a full dose "
+                        f"where no amount was given (max {choice.max_daily_mg}mg/day)")
+            else:
+                note = f"Dose reduced: {taken_24h:g}mg already taken in the last 24 hours (max {choice.max_daily_mg}mg/day)"
+            safety_warning = note if safety_warning == "Dose validated and safe" else f"{safety_warning}; {note}"
 
     # Use AI pharmacist dosing if available, otherwise fall back to rule-based
-    if ai_recommendation and ai_recommendation.get("dosing"):
+    use_ai_dosing = bool(ai_recommendation and ai_recommendation.get("dosing")) and not daily_capped
+    if use_ai_dosing:
         ai_dosing = ai_recommendation["dosing"]
         dose_text = ai_dosing.get("dose_text", "")
         how_to_take = ai_dosing.get("frequency", "")
         ai_total_mg = ai_dosing.get("total_mg", 0)
         
         # TRIPLE-CHECK: Re-verify unit math & cap for safety (never exceed validated dose)
-        if choice["form"] == "tablet":
-            _, units, confirmed_mg = format_tablet_dose(min(ai_total_mg, final_validated_mg), choice["unit_mg"])
-            unit_details = {"units_per_dose": units, "per_unit_mg": choice["unit_mg"], "confirmed_total_mg": confirmed_mg}
-        elif choice["form"] == "liquid":
-            _, ml, confirmed_mg = format_liquid_dose(min(ai_total_mg, final_validated_mg), choice["mg_per_ml"])
-            unit_details = {"ml_per_dose": ml, "mg_per_ml": choice["mg_per_ml"], "confirmed_total_mg": confirmed_mg}
+        if choice.form == "tablet":
+            _, units, confirmed_mg = format_tablet_dose(min(ai_total_mg, final_validated_mg), choice.unit_mg)
+            unit_details = {"units_per_dose": units, "per_unit_mg": choice.unit_mg, "confirmed_total_mg": confirmed_mg}
+        elif choice.form == "liquid":
+            _, ml, confirmed_mg = format_liquid_dose(min(ai_total_mg, final_validated_mg), choice.mg_per_ml)
+            unit_details = {"ml_per_dose": ml, "mg_per_ml": choice.mg_per_ml, "confirmed_total_mg": confirmed_mg}
         else:
             confirmed_mg = min(ai_total_mg, final_validated_mg)
             unit_details = {"confirmed_total_mg": confirmed_mg}
     else:
         # Fallback to rule-based dosing (using validated dose)
-        if choice["form"] == "tablet":
-            dose_text, units, confirmed_mg = format_tablet_dose(final_validated_mg, choice["unit_mg"])
-            unit_details = {"units_per_dose": units, "per_unit_mg": choice["unit_mg"], "confirmed_total_mg": confirmed_mg}
-        elif choice["form"] == "liquid":
-            dose_text, ml, confirmed_mg = format_liquid_dose(final_validated_mg, choice["mg_per_ml"])
-            unit_details = {"ml_per_dose": ml, "mg_per_ml": choice["mg_per_ml"], "confirmed_total_mg": confirmed_mg}
+        if choice.form == "tablet":
+            dose_text, units, confirmed_mg = format_tablet_dose(final_validated_mg, choice.unit_mg)
+            unit_details = {"units_per_dose": units, "per_unit_mg": choice.unit_mg, "confirmed_total_mg": confirmed_mg}
+        elif choice.form == "liquid":
+            dose_text, ml, confirmed_mg = format_liquid_dose(final_validated_mg, choice.mg_per_ml)
+            unit_details = {"ml_per_dose": ml, "mg_per_ml": choice.mg_per_ml, "confirmed_total_mg": confirmed_mg}
         else:
             dose_text = f"{final_validated_mg} mg"
             unit_details = {"confirmed_total_mg": final_validated_mg}
 
     # how_to_take is now set in the AI pharmacist dosing section above
     # If we're using fallback, set it here
-    if not ai_recommendation or not ai_recommendation.get("dosing", {}).get("frequency"):
-        freq_label = choice["frequency_label"]
-        if drug_key == "ibuprofen" and choice.get("frequency_hours") == 6:
+    if not use_ai_dosing or not ai_recommendation["dosing"].get("frequency"):
+        freq_label = choice.frequency_label
+        if drug_key == "ibuprofen" and choice.frequency_hours == 6:
             how_to_take = f"{dose_text} • every 6–8 hours with food as needed"
         else:
             how_to_take = f"{dose_text} • {freq_label}"
 
-    timing_advice = build_timing_advice(payload.notes or "")
+    timing_advice = build_timing_advice(payload.notes or "", timeline, now)
 
     response = {
-        "drug_name": f"{choice['brand']} ({choice['generic']})",
+        "drug_name": choice.display_name,
         "dosage": dose_text,
         "frequency": how_to_take,
-        "side_effects": (
-            "May cause stomach irritation; take with food and avoid if you have ulcers or kidney issues."
-            if drug_key == "ibuprofen" else
-            "May cause nausea or upset stomach if taken on an empty stomach."
-            if drug_key == "acetaminophen" else
-            "May cause drowsiness or dizziness; avoid combining with certain antidepressants (MAOIs)."
-            if drug_key == "dextromethorphan" else
-            "See label for common side effects."
-        ),
+        "side_effects": choice.side_effects,
         "timing_advice": timing_advice,
         "safety_validation": {
             "is_safe": is_safe,
@@ -508,23 +944,111 @@ def recommend():
             "safety_validation": ai_recommendation.get("safety_validation", {}) if ai_recommendation else {}
         } if ai_recommendation else None,
         "alternatives": alternatives if alternatives else None,
-        "medical_disclaimer": (
-            "IMPORTANT: AbsorpGen AI is a proof-of-concept and not a substitute for professional medical advice. "
-            "Always consult a qualified clinician for diagnosis and treatment."
-        ),
+        "medical_disclaimer": MEDICAL_DISCLAIMER,
         "dose_basis": {
             "suggested_single_dose_mg": final_validated_mg,  # Use validated dose
             "single_dose_cap_mg": cap,
             "max_daily_mg": max_day,
-            "form": choice["form"],
+            "form": choice.form,
             **unit_details,
-            "policy": "AI PHARMACIST: Intelligent medication selection + comprehensive safety validation + hard OTC caps",
+            "policy": DOSE_POLICY,
             "ai_used": ai_recommendation is not None,
+            "decision_source": decision_source,
             "safety_checks_passed": is_safe,
         },
     }
-    return jsonify(response), 200
+    if session is not None:
+        session.last_drug_key = drug_key
+    return response
+
+
+# ───────────────────────── API: Sessions ─────────────────────────
+def session_notes(notes:str, last_drug_key:str)->str:
+    """
+    Follow-up notes with "it" made explicit: notes that name no drug but describe taking one
+    ("I took it 2 hours ago") or getting no relief ("it didn't help") are taken to be about
+    the drug last recommended in the session. Other notes are left as they are.
+    """
+    if not notes or not last_drug_key or parse_intake_notes(notes):
+        return notes or ""
+    about_a_dose = _parse_hours_ago(notes) is not None or TOOK_RE.search(notes) or NO_RELIEF_RE.search(notes)
+    if not about_a_dose:
+        return notes
+    return f"{CATALOG[last_drug_key].generic}: {notes}"
+
+def intake_summary(timeline:IntakeTimeline, now:float)->list:
+    return [
+        {"drug": key, "mg_last_24h": timeline.mg_last_24h(key, now),
+         "mg_assumed": timeline.mg_assumed_last_24h(key, now),  # full doses assumed where no amount was given
+         "hours_since_last": round((now - timeline.last_dose(key, now)) / 3600, 1)}
+        for key in timeline.recent_drugs(now)
+    ]
+
+@app.route("/sessions", methods=["POST", "OPTIONS"])
+def create_session():
+    if request.method == "OPTIONS":
+        return "", 200
+    deadline = Deadline.from_headers(request.headers, REQUEST_DEADLINE_MS)
+    try:
+        payload = UserRequest(**(request.get_json(force=True)))
+    except Exception as e:
+        return jsonify(APIError(error=f"Invalid request: {e}").model_dump()), 400
+
+    red_flags = match_red_flags(payload.symptoms + payload.conditions)
+    if red_flags:
+        return triage_response(red_flags)  # no session: this needs a doctor, not follow-ups
+
+    session_id = secrets.token_urlsafe(16)
+    payload = payload.model_copy(update={"session_id": session_id})
+    now = time.time()
+    session = Session(payload, build_intake_timeline(payload, now))
+    SESSIONS.set(session_id, session)
+    metrics.incr("sessions_created")
+    with session.hold(deadline):
+        response = build_recommendation(payload, payload.model_dump(mode="json"), session.timeline, now, deadline, session=session)
+    body = {"session_id": session_id, **shape(response, request.args, REFERENCES)}
+    return json_response(body, request.headers.get("Accept-Encoding")), 201
+
+@app.route("/sessions/<session_id>/followup", methods=["POST", "OPTIONS"])
+def session_followup(session_id):
+    if request.method == "OPTIONS":
+        return "", 200
+    deadline = Deadline.from_headers(request.headers, REQUEST_DEADLINE_MS)
+    session = SESSIONS.get(session_id)
+    if session is None:
+        return jsonify(APIError(error="Unknown or expired session").model_dump()), 404
+    try:
+        delta = SessionDelta(**(request.get_json(force=True)))
+    except Exception as e:
+        return jsonify(APIError(error=f"Invalid request: {e}").model_dump()), 400
+
+    # The profile was screened when the session was created; only new symptoms need it
+    red_flags = match_red_flags(delta.symptoms)
+    if red_flags:
+        return triage_response(red_flags)
+
+    metrics.incr("session_followups")
+    with session.hold(deadline):
+        now = time.time()
+        payload = session.apply(delta, session_notes(delta.notes, session.last_drug_key))
+        ineffective_key, _, no_relief = detect_recent_medication(payload.notes)
+        if no_relief and ineffective_key:
+            session.ineffective.add(ineffective_key)  # stays ruled out for the session
+        timeline = build_intake_timeline(payload, now, timeline=session.timeline)
+        ai_delta = {
+            "changes": delta.model_dump(mode="json", exclude_defaults=True),
+            "current": {"symptoms": payload.symptoms, "pain_level": payload.pain_level,
+                        "recent_intake": intake_summary(timeline, now)},
+        }
+        response = build_recommendation(payload, payload.model_dump(mode="json"), timeline, now, deadline,
+                                        session=session, ai_delta=ai_delta)
+    body = {"session_id": session_id, **shape(response, request.args, REFERENCES)}
+    return json_response(body, request.headers.get("Accept-Encoding")), 200
 
+@app.route("/sessions/<session_id>", methods=["DELETE"])
+def end_session(session_id):
+    SESSIONS.pop(session_id)
+    return "", 204
 
 if __name__ == "__main__":
     # If you open the frontend at http://localhost:5000/, calls to http://127.0.0.1:5000
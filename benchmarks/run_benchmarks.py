@@ -0,0 +1,276 @@
+# benchmarks/run_benchmarks.py
+"""
+Micro-benchmarks for the request hot path, with a committed baseline.
+
+    python benchmarks/run_benchmarks.py                    # run and print
+    python benchmarks/run_benchmarks.py --compare          # fail on regressions vs baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline    # record a new baseline
+
+The AI pharmacist is stubbed out, so recommend() timings cover only local work. Numbers
+are machine-specific: record the baseline on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-not-used")  # the client is never called
+
+import app_simple
+from app_simple import (
+    app, recommend, create_session, session_followup, select_otc, detect_recent_medication, _parse_hours_ago,
+    validate_dose_safety, format_tablet_dose, format_liquid_dose, REFERENCES, parse_intake_notes,
+)
+from intake_timeline import IntakeTimeline
+from dosing_rules import compute_conservative_dose
+from response_shaping import shape, json_response
+from safety import has_red_flag, RED_FLAG_MATCHER
+from validators import UserRequest
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SYMPTOMS = [
+    "headache", "fever", "sore throat", "toothache", "muscle aches", "joint pain", "back pain",
+    "sprain", "cough", "dry cough", "productive cough", "chest congestion", "mucus", "sneezing",
+    "runny nose", "itchy eyes", "allergies", "heartburn", "acid reflux", "indigestion",
+    "nausea", "motion sickness", "vertigo", "tiredness", "chills", "stuffy nose",
+]
+CONDITIONS = ["hypertension", "asthma", "diabetes", "kidney disease", "ulcer", "migraines"]
+ALLERGIES = ["penicillin", "sulfa", "latex", "tylenol", "advil", "peanuts"]
+NOTE_SENTENCES = [
+    "I took Tylenol 2 hours ago and it didn't help.",
+    "Symptoms started yesterday evening after work.",
+    "I have been drinking plenty of water and resting.",
+    "The pain gets worse when I bend over or lift things.",
+    "Took two advil about five hours back.",
+    "No known drug interactions that I am aware of.",
+]
+TYPO_SYMPTOMS = ["hedache", "runy nose", "sor throat", "musle aches", "heartbrun", "snezing"]
+TYPO_NOTES = "Took tylenl about 2 hours ago, still in pain. " * 5
+
+# (symptom count, condition count, note sentences)
+SIZES = {"small": (2, 0, 1), "medium": (6, 2, 6), "large": (25, 5, 120)}
+
+AI_STUB = {
+    "selected_medication": {"drug_key": "acetaminophen", "brand": "Tylenol", "generic": "Acetaminophen",
+                            "reasoning": "Fever and headache without contraindications", "safety_notes": "Do not exceed daily max"},
+    "dosing": {"dose_text": "2 tablets (500mg each)", "frequency": "every 6 hours as needed", "total_mg": 1000,
+               "max_daily_mg": 3000, "dose_rationale": "Standard adult dose"},
+    "alternatives": [{"drug_key": "ibuprofen", "brand": "Advil", "generic": "Ibuprofen",
+                      "reason": "Anti-inflammatory", "when_to_consider": "If no GI issues"}],
+    "patient_education": {"key_points": ["Take with water", "Rest"], "warnings": ["Avoid alcohol"],
+                          "when_to_seek_help": "If fever lasts more than 3 days"},
+    "safety_validation": {"dose_within_limits": True, "contraindications_checked": True,
+                          "age_appropriate": True, "weight_appropriate": True},
+}
+
+
+def make_payload(size: str, seed: int = 7) -> dict:
+    rng = random.Random(f"{size}-{seed}")
+    n_sym, n_cond, n_notes = SIZES[size]
+    return {
+        "age": rng.randint(18, 64),
+        "sex": rng.choice(["F", "M"]),
+        "height_cm": round(rng.uniform(150, 195), 1),
+        "weight_kg": round(rng.uniform(50, 110), 1),
+        "symptoms": [rng.choice(SYMPTOMS) for _ in range(n_sym)],
+        "allergies": rng.sample(ALLERGIES, min(2, n_cond)),
+        "conditions": [rng.choice(CONDITIONS) for _ in range(n_cond)],
+        "pain_level": rng.randint(1, 7),
+        "notes": " ".join(rng.choice(NOTE_SENTENCES) for _ in range(n_notes)),
+    }
+
+
+def make_timeline(n_doses: int, seed: int = 7) -> IntakeTimeline:
+    """A month of acetaminophen/ibuprofen doses, inserted out of order."""
+    rng = random.Random(seed)
+    timeline, now = IntakeTimeline(), time.time()
+    for _ in range(n_doses):
+        timeline.add(rng.choice(["acetaminophen", "ibuprofen"]), rng.choice([200, 400, 500, 1000]),
+                     now - rng.uniform(0, 30 * 86400))
+    return timeline
+
+
+def _call_recommend(payload: dict) -> Callable[[], object]:
+    def run():
+        with app.test_request_context("/recommend", method="POST", json=payload):
+            return recommend()
+    return run
+
+def _call_followup(profile: dict, delta: dict) -> Callable[[], object]:
+    """Follow-up on a session created on first call (so the AI stub is already installed)."""
+    state = {}
+    def run():
+        if "id" not in state:
+            with app.test_request_context("/sessions", method="POST", json=profile):
+                resp, _ = create_session()
+            state["id"] = json.loads(resp.get_data())["session_id"]
+        with app.test_request_context(f"/sessions/{state['id']}/followup", method="POST", json=delta):
+            return session_followup(state["id"])
+    return run
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    cases = []
+    for size in SIZES:
+        p = make_payload(size)
+        texts = p["symptoms"] + p["conditions"]
+        cases += [
+            (f"has_red_flag[{size}]", lambda t=texts: has_red_flag(t)),
+            (f"detect_recent_medication[{size}]", lambda n=p["notes"]: detect_recent_medication(n)),
+            (f"parse_hours_ago[{size}]", lambda n=p["notes"]: _parse_hours_ago(n)),
+            (f"select_otc[{size}]", lambda p=p: select_otc(p["symptoms"], p["allergies"], p["conditions"],
+                                                           pain_level=p["pain_level"], notes=p["notes"])),
+            (f"user_request_validation[{size}]", lambda p=p: UserRequest(**p)),
+        ]
+    # Misspelt input exercises the fuzzy (deletion index) path; nothing here is a red flag
+    cases += [
+        ("has_red_flag[typo]", lambda: has_red_flag(TYPO_SYMPTOMS)),
+        ("select_otc[typo]", lambda: select_otc(TYPO_SYMPTOMS, [], [], pain_level=4, notes=TYPO_NOTES)),
+        ("detect_recent_medication[typo]", lambda: detect_recent_medication(TYPO_NOTES)),
+        ("fuzzy_correct_word[uncached]", lambda: RED_FLAG_MATCHER._correct_word("shortnes")),
+    ]
+    # Intake timeline: lookups over a long history, note parsing, structured intake
+    timeline, now = make_timeline(1000), time.time()
+    cases += [
+        ("intake_next_allowed[1k doses]", lambda: timeline.next_allowed("acetaminophen", now, 6, 3000, 500)),
+        ("intake_mg_last_24h[1k doses]", lambda: timeline.mg_last_24h("ibuprofen", now)),
+        ("parse_intake_notes[large]", lambda n=make_payload("large")["notes"]: parse_intake_notes(n)),
+    ]
+    p = make_payload("medium")
+    cases += [
+        ("compute_conservative_dose", lambda: compute_conservative_dose(
+            drug_key="ibuprofen", height_cm=p["height_cm"], weight_kg=p["weight_kg"], age=p["age"], conditions=p["conditions"])),
+        ("validate_dose_safety", lambda: validate_dose_safety("ibuprofen", 600, p["age"], p["weight_kg"], p["conditions"])),
+        ("format_tablet_dose", lambda: format_tablet_dose(750, 500)),
+        ("format_liquid_dose", lambda: format_liquid_dose(60, 6)),
+    ]
+
+    # Full recommend() with the AI stubbed: once with an AI answer, once as the rule-only fallback
+    full = make_payload("medium")
+    full["conditions"] = ["asthma"]  # keeps the AI gate from skipping the (stubbed) AI call
+    cases += [
+        ("recommend_ai_stub[medium]", _call_recommend(full)),
+        ("recommend_rules_only[medium]", _call_recommend(full)),
+        ("recommend_rules_only[large]", _call_recommend(make_payload("large"))),
+    ]
+    taken = datetime.now(timezone.utc)
+    with_intake = {**make_payload("medium"), "intake": [
+        {"drug": "tylenol", "mg": 500, "taken_at": (taken - timedelta(hours=h)).isoformat()} for h in range(7, 31, 6)
+    ]}
+    cases.append(("recommend_rules_only[intake]", _call_recommend(with_intake)))
+    # Session follow-up sending only a delta, vs recommend_ai_stub[medium] resending everything
+    cases.append(("session_followup_ai_stub[medium]", _call_followup(full, {"notes": "Headache is a bit better", "pain_level": 4})))
+    return cases
+
+def _install_ai_stub(answer):
+    async def stub(payload, candidates=None, timeout=None):
+        return answer
+    async def followup_stub(base_messages, prior_reply, delta, timeout=None):
+        return answer
+    app_simple.get_ai_pharmacist_recommendation_async = stub
+    app_simple.get_ai_pharmacist_followup_async = followup_stub
+
+def _serialization_cases() -> List[Tuple[str, Callable[[], object]]]:
+    _install_ai_stub(AI_STUB)
+    full = make_payload("medium")
+    full["conditions"] = ["asthma"]
+    with app.test_request_context("/recommend", method="POST", json=full):
+        resp, _ = recommend()
+    data = json.loads(resp.get_data())
+    return [
+        ("serialize_response[full]", lambda: json_response(shape(data, {}, REFERENCES), None)),
+        ("serialize_response[compact]", lambda: json_response(shape(data, {"profile": "compact"}, REFERENCES), None)),
+        ("serialize_response[full,gzip]", lambda: json_response(shape(data, {}, REFERENCES), "gzip")),
+    ]
+
+
+def time_case(fn: Callable[[], object], repeat: int = 9) -> float:
+    """Best-of-repeat time per call in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+def run(filter_text: str = "", names: Optional[List[str]] = None) -> Dict[str, float]:
+    results = {}
+    cases = build_cases() + _serialization_cases()
+    for name, fn in cases:
+        if filter_text and filter_text not in name:
+            continue
+        if names is not None and name not in names:
+            continue
+        # recommend_* cases pick the AI answer by name
+        _install_ai_stub(None if "rules_only" in name else AI_STUB)
+        results[name] = time_case(fn)
+        print(f"{name:<40} {results[name]:>12.2f} us")
+    return results
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    for name, us in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40} (no baseline)")
+            continue
+        change = us / base - 1.0
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:<40} {base:>10.2f} -> {us:>10.2f} us  {change:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AbsorpGen hot-path micro-benchmarks")
+    parser.add_argument("--compare", action="store_true", help="compare against the committed baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the committed baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--recheck", type=int, default=2, help="times to re-time flagged benchmarks before failing")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter)
+
+    if args.save_baseline:
+        saved = {k: round(v, 3) for k, v in results.items()}
+        if args.filter and os.path.exists(BASELINE_PATH):
+            # a filtered run only replaces the benchmarks it ran
+            with open(BASELINE_PATH) as fh:
+                saved = {**json.load(fh)["results"], **saved}
+        with open(BASELINE_PATH, "w") as fh:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(), "unit": "us_per_call"},
+                "results": dict(sorted(saved.items())),
+            }, fh, indent=2)
+            fh.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if args.compare:
+        with open(BASELINE_PATH) as fh:
+            baseline = json.load(fh)["results"]
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        for _ in range(args.recheck):
+            if not regressions:
+                break
+            # Host noise comes in bursts; a real regression is still slow when timed again
+            print(f"\nRe-timing {len(regressions)} flagged benchmark(s)")
+            retimed = run(names=regressions)
+            results.update({name: min(results[name], us) for name, us in retimed.items()})
+            print()
+            regressions = compare({name: results[name] for name in regressions}, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+# catalog_records.py
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+DEFAULT_SIDE_EFFECTS = "See label for common side effects."
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogRecord:
+    """
+    One compiled OTC catalog entry. Records are built once at startup and shared by
+    reference across requests; derived fields are precomputed here instead of per request.
+    """
+    key: str
+    generic: str
+    brands: Tuple[str, ...]
+    therapeutic_class: str
+    form: str                       # "tablet" | "liquid"
+    unit_mg: Optional[int]          # tablets
+    mg_per_ml: Optional[float]      # liquids
+    single_dose_cap_mg: int
+    max_daily_mg: Optional[int]
+    symptoms: Tuple[str, ...]
+    avoid_if: Tuple[str, ...]
+    frequency_hours: Optional[int]
+    frequency_label: str
+    side_effects: str
+    # derived
+    brand: str                      # primary brand
+    display_name: str               # "Tylenol (Acetaminophen)"
+    generic_lower: str
+    brands_lower: FrozenSet[str]
+
+
+def compile_record(key: str, meta: dict) -> CatalogRecord:
+    brands = tuple(meta["brands"])
+    return CatalogRecord(
+        key=key,
+        generic=meta["generic"],
+        brands=brands,
+        therapeutic_class=meta.get("therapeutic_class", key),
+        form=meta["form"],
+        unit_mg=meta.get("unit_mg"),
+        mg_per_ml=meta.get("mg_per_ml"),
+        single_dose_cap_mg=meta["single_dose_cap_mg"],
+        max_daily_mg=meta.get("max_daily_mg"),
+        symptoms=tuple(meta.get("symptoms", ())),
+        avoid_if=tuple(meta.get("avoid_if", ())),
+        frequency_hours=meta.get("frequency_hours"),
+        frequency_label=meta["frequency_label"],
+        side_effects=meta.get("side_effects") or DEFAULT_SIDE_EFFECTS,
+        brand=brands[0],
+        display_name=f"{brands[0]} ({meta['generic']})",
+        generic_lower=meta["generic"].lower(),
+        brands_lower=frozenset(b.lower() for b in brands),
+    )
+
+def compile_catalog(catalog: Dict[str, dict], order: List[str]) -> Dict[str, CatalogRecord]:
+    """Compiled records keyed by drug_key, in catalog order."""
+    return {key: compile_record(key, catalog[key]) for key in order}
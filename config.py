@@ -0,0 +1,7 @@
+# config.py
+# Per-dose caps (mg) applied by dosing_rules.apply_safety_cap; they match the catalog's
+# single_dose_cap_mg for the drugs the dosing policy covers.
+MAX_DOSE_MG = {
+    "acetaminophen": 1000,
+    "ibuprofen": 800,
+}
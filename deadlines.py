@@ -0,0 +1,104 @@
+# deadlines.py
+import asyncio
+import concurrent.futures
+import socket
+import ssl
+import threading
+import time
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], default_ms: int) -> "Deadline":
+        """Deadline from the client's timeout header, never longer than the server default."""
+        budget_ms = default_ms
+        raw = headers.get(DEADLINE_HEADER)
+        if raw:
+            try:
+                budget_ms = min(default_ms, max(0, int(raw)))
+            except ValueError:
+                pass
+        return cls(budget_ms / 1000.0)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"request deadline of {self.budget_s:.1f}s exceeded")
+
+
+def client_disconnected(environ: Mapping[str, Any]) -> bool:
+    """
+    Best-effort check whether the client closed its connection. Only works when the WSGI
+    server exposes a plain socket (werkzeug does, as werkzeug.socket); otherwise returns
+    False. TLS sockets can't be peeked at (SSLSocket.recv rejects flags).
+    """
+    sock = environ.get("werkzeug.socket")
+    flags = getattr(socket, "MSG_DONTWAIT", 0)
+    if sock is None or not flags or isinstance(sock, ssl.SSLSocket):
+        return False
+    try:
+        return sock.recv(1, socket.MSG_PEEK | flags) == b""
+    except BlockingIOError:
+        return False
+    except ValueError:  # a socket type that doesn't take recv flags
+        return False
+    except OSError:
+        return True
+
+
+_loop_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    The process-wide event loop for outbound async calls, run by one daemon thread started
+    on first use. It does not depend on the WSGI server's threads, so a server that starts a
+    thread per request doesn't leave a loop (and an HTTP client pool) behind per request.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-calls", daemon=True).start()
+        return _loop
+
+def run_cancellable(make_call: Callable[[float], Awaitable[Any]], deadline: Deadline,
+                    is_disconnected: Optional[Callable[[], bool]] = None, poll_s: float = 0.1) -> Any:
+    """
+    Run the coroutine returned by make_call(timeout_s) to completion from sync code.
+    The task (and with it any outbound HTTP request) is cancelled as soon as the deadline
+    passes or is_disconnected() reports that the client went away. The coroutine runs on
+    the background loop; deadline and disconnect checks stay in the calling thread.
+    """
+    future = asyncio.run_coroutine_threadsafe(make_call(deadline.remaining()), _background_loop())
+    try:
+        while True:
+            done, _ = concurrent.futures.wait([future], timeout=min(poll_s, deadline.remaining()))
+            if done:
+                return future.result()
+            if deadline.expired():
+                raise DeadlineExceeded(f"request deadline of {deadline.budget_s:.1f}s exceeded")
+            if is_disconnected and is_disconnected():
+                raise ClientDisconnected("client closed the connection")
+    finally:
+        future.cancel()  # no-op once finished; otherwise cancels the task on the loop
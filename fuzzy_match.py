@@ -0,0 +1,147 @@
+# fuzzy_match.py
+"""
+Typo-tolerant term matching with a symmetric-deletion (SymSpell-style) index.
+
+The vocabulary is the set of words in the canonical terms. Every word's deletions (up to
+MAX_EDITS) are indexed once; a query word only generates its own deletions and looks them
+up, so a correction costs a handful of dict lookups regardless of vocabulary size.
+Candidates are confirmed with an optimal-string-alignment distance (a transposition
+such as "pian" -> "pain" counts as one edit).
+"""
+import re
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+MAX_EDITS = 2
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# the same split for ASCII text, as a single translate pass: every other character is a separator
+_ASCII_SEPARATORS = str.maketrans({c: " " for c in map(chr, range(128)) if not _WORD_RE.fullmatch(c)})
+
+
+class FuzzyMatch(NamedTuple):
+    term: str       # canonical term, e.g. "shortness of breath"
+    matched: str    # text it matched, e.g. "shortnes of breath"
+    distance: int   # total edits across the term's words
+
+
+def allowed_edits(word: str, min_len: int = 4) -> int:
+    """Words shorter than min_len must match exactly; longer words tolerate more typos."""
+    n = len(word)
+    if n < min_len: return 0
+    if n < 9: return 1
+    return MAX_EDITS
+
+def _deletes(word: str, max_edits: int) -> Set[str]:
+    out = set()
+    for d in range(1, min(max_edits, len(word) - 1) + 1):
+        for idx in combinations(range(len(word)), d):
+            out.add("".join(c for i, c in enumerate(word) if i not in idx))
+    return out
+
+def osa_distance(a: str, b: str) -> int:
+    """Levenshtein distance that also counts an adjacent transposition as one edit."""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase [a-z0-9]+ words of text; any other character separates words."""
+    text = (text or "").lower()
+    if text.isascii():
+        return text.translate(_ASCII_SEPARATORS).split()
+    return _WORD_RE.findall(text)
+
+
+class FuzzyMatcher:
+    """
+    known_words are valid words outside the vocabulary that must never be "corrected"
+    (so "motion" in free text is not read as the alias "motrin"); see lexicon.py.
+    Vocabulary words shorter than min_fuzzy_len are only matched exactly. With
+    single_word_typos=False, find() only tolerates typos inside multi-word terms: a lone
+    misspelt word is too often a different real word ("strike" is not "stroke").
+    """
+
+    def __init__(self, terms: Iterable[str], known_words: Iterable[str] = (),
+                 min_fuzzy_len: int = 4, single_word_typos: bool = True):
+        self.terms: Dict[str, str] = {}           # normalized phrase -> canonical term
+        self.vocab: Dict[str, int] = {}           # word -> first-seen rank (tie-breaker)
+        self._delete_index: Dict[str, List[str]] = {}
+        for term in terms:
+            phrase = " ".join(tokenize(term))
+            if not phrase: continue
+            self.terms.setdefault(phrase, term)
+            for word in phrase.split():
+                self.vocab.setdefault(word, len(self.vocab))
+        for word in self.vocab:
+            for d in _deletes(word, MAX_EDITS):
+                self._delete_index.setdefault(d, []).append(word)
+        self.known_words = {w for text in known_words for w in tokenize(text)}
+        self.min_fuzzy_len = min_fuzzy_len
+        self.single_word_typos = single_word_typos
+        self._max_words = max((len(p.split()) for p in self.terms), default=1)
+        # leading words of every term ("shortness", "shortness of", ...): phrase building
+        # stops as soon as the phrase can no longer grow into a term
+        self._prefixes = {" ".join(p.split()[:k]) for p in self.terms for k in range(1, len(p.split()) + 1)}
+        # Words in free text repeat a lot; remember corrections per matcher
+        self.correct_word = lru_cache(maxsize=8192)(self._correct_word)
+
+    def _correct_word(self, word: str) -> Tuple[str, int]:
+        """(vocabulary word, edits) for a word, or (word, 0) if nothing is close enough."""
+        if word in self.vocab or word in self.known_words:
+            return word, 0
+        limit = allowed_edits(word)
+        if limit == 0:
+            return word, 0
+        candidates: Set[str] = set(self._delete_index.get(word, ()))
+        for d in _deletes(word, limit):
+            if d in self.vocab:
+                candidates.add(d)
+            candidates.update(self._delete_index.get(d, ()))
+        best: Optional[Tuple[int, int, str]] = None
+        for cand in candidates:
+            if allowed_edits(cand, self.min_fuzzy_len) == 0:
+                continue
+            dist = osa_distance(word, cand)
+            if dist <= limit and (best is None or (dist, self.vocab[cand]) < best[:2]):
+                best = (dist, self.vocab[cand], cand)
+        return (best[2], best[0]) if best else (word, 0)
+
+    def correct_words(self, text: str) -> List[str]:
+        """Words of text with misspelt ones replaced by their closest vocabulary word."""
+        words = tokenize(text)
+        fixed = {w: self.correct_word(w)[0] for w in set(words)}  # long notes repeat words
+        return [fixed[w] for w in words]
+
+    def normalize(self, text: str) -> str:
+        """Text with misspelt words replaced by their closest vocabulary word."""
+        return " ".join(self.correct_words(text))
+
+    def find(self, text: str) -> List[FuzzyMatch]:
+        """Canonical terms present in text (as whole words) after typo correction."""
+        words = tokenize(text)
+        fixed = [self.correct_word(w) for w in words]
+        fixed_words = [w for w, _ in fixed]
+        found: Dict[str, FuzzyMatch] = {}
+        for i in range(len(words)):
+            if fixed_words[i] not in self._prefixes:
+                continue  # no term starts here; skip building phrases
+            for n in range(1, min(self._max_words, len(words) - i) + 1):
+                phrase = " ".join(fixed_words[i:i + n])
+                if phrase not in self._prefixes:
+                    break
+                term = self.terms.get(phrase)
+                if term is not None and term not in found:
+                    dist = sum(d for _, d in fixed[i:i + n])
+                    if dist and n == 1 and not self.single_word_typos:
+                        continue
+                    found[term] = FuzzyMatch(term, " ".join(words[i:i + n]), dist)
+        return list(found.values())
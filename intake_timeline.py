@@ -0,0 +1,111 @@
+# intake_timeline.py
+import bisect
+import threading
+from typing import Dict, List, Optional
+
+DAY_S = 24 * 3600.0
+
+
+class _DrugDoses:
+    """Doses of one drug: sorted timestamps with running mg totals (prefix[i] = mg of doses before i)."""
+    __slots__ = ("times", "prefix")
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.prefix: List[float] = [0.0]
+
+    def add(self, taken_at: float, mg: float) -> None:
+        i = bisect.bisect_right(self.times, taken_at)
+        self.times.insert(i, taken_at)
+        if i == len(self.times) - 1:  # the usual case: newest dose, O(1) prefix update
+            self.prefix.append(self.prefix[-1] + mg)
+        else:
+            self.prefix.insert(i + 1, self.prefix[i] + mg)
+            for j in range(i + 2, len(self.prefix)):
+                self.prefix[j] += mg
+
+    def mg_between(self, start: float, end: float) -> float:
+        """mg taken in the window (start, end]."""
+        lo = bisect.bisect_right(self.times, start)
+        hi = bisect.bisect_right(self.times, end)
+        return self.prefix[hi] - self.prefix[lo]
+
+
+class IntakeTimeline:
+    """
+    Medication intake history (epoch seconds), indexed per drug so that last dose,
+    trailing-24h totals and the earliest next allowed dose are logarithmic lookups.
+    """
+
+    def __init__(self):
+        self._doses: Dict[str, _DrugDoses] = {}
+        self._assumed: Dict[str, _DrugDoses] = {}  # the doses whose mg was not reported
+        self._lock = threading.RLock()
+
+    def add(self, drug_key: str, mg: float, taken_at: float, dedup_window_s: float = 0.0,
+            assumed: bool = False) -> bool:
+        """
+        Record a dose. assumed marks an mg figure the patient didn't give (a conservative
+        stand-in), so it can be counted for limits without being reported back as fact.
+        Returns False (and records nothing) when a dose of the same drug is already recorded
+        within dedup_window_s of taken_at, e.g. the same note resent.
+        """
+        with self._lock:
+            doses = self._doses.setdefault(drug_key, _DrugDoses())
+            i = bisect.bisect_left(doses.times, taken_at - dedup_window_s)
+            if i < len(doses.times) and doses.times[i] <= taken_at + dedup_window_s:
+                return False
+            doses.add(taken_at, mg)
+            if assumed:
+                self._assumed.setdefault(drug_key, _DrugDoses()).add(taken_at, mg)
+            return True
+
+    def recent_drugs(self, now: float, window_s: float = DAY_S) -> List[str]:
+        """Drugs with at least one dose in the trailing window."""
+        with self._lock:
+            return [key for key in self._doses if (self.last_dose(key, now) or float("-inf")) > now - window_s]
+
+    def last_dose(self, drug_key: str, now: float) -> Optional[float]:
+        with self._lock:
+            doses = self._doses.get(drug_key)
+            if not doses:
+                return None
+            i = bisect.bisect_right(doses.times, now)
+            return doses.times[i - 1] if i else None
+
+    def mg_last_24h(self, drug_key: str, now: float) -> float:
+        with self._lock:
+            doses = self._doses.get(drug_key)
+            return doses.mg_between(now - DAY_S, now) if doses else 0.0
+
+    def mg_assumed_last_24h(self, drug_key: str, now: float) -> float:
+        """The part of mg_last_24h that comes from assumed amounts."""
+        with self._lock:
+            doses = self._assumed.get(drug_key)
+            return doses.mg_between(now - DAY_S, now) if doses else 0.0
+
+    def next_allowed(self, drug_key: str, now: float, frequency_hours: Optional[float],
+                     max_daily_mg: Optional[float], dose_mg: float) -> float:
+        """
+        Earliest time >= now at which dose_mg more of the drug respects both the dosing
+        interval and the trailing-24h maximum. Returns now if it can be taken right away.
+        """
+        with self._lock:
+            doses = self._doses.get(drug_key)
+            if not doses:
+                return now
+            earliest = now
+            last = self.last_dose(drug_key, now)
+            if last is not None and frequency_hours:
+                earliest = max(earliest, last + frequency_hours * 3600.0)
+            if max_daily_mg is not None:
+                lo = bisect.bisect_right(doses.times, now - DAY_S)
+                hi = bisect.bisect_right(doses.times, now)
+                room = max_daily_mg - dose_mg
+                if room < 0:
+                    return float("inf")
+                if doses.prefix[hi] - doses.prefix[lo] > room:
+                    # the oldest doses have to age out of the window until the rest fits in `room`
+                    j = bisect.bisect_left(doses.prefix, doses.prefix[hi] - room, lo, hi + 1)
+                    earliest = max(earliest, doses.times[j - 1] + DAY_S)
+            return earliest
@@ -0,0 +1,105 @@
+# lexicon.py
+"""
+Everyday English words that typo correction must leave alone.
+
+The fuzzy matchers only know their own vocabulary (red flags, symptoms, drug names), so
+without a lexicon any real word one edit away from it is "corrected" into it: "canker"
+into cancer, "painting" into fainting, "gums" into tums. Words listed here are taken as
+spelt. The list favours words that patients write in notes and the real words close to
+the matchers' vocabulary; misspellings ("stomache", "hart") are deliberately absent.
+"""
+from typing import FrozenSet
+
+# Function words and everyday verbs, adverbs and time words found in notes
+_GENERAL = """
+a about above after again against ago all almost alone along already also although always
+am among an and another any anyone anything are around as ask asked at away back bad badly
+be became because become been before began behind being below best better between big bit
+both bring brought but by call called came can cannot cant could couldnt day days did didnt
+different do does doesnt doing done dont down during each early either else enough even
+evening ever every everything few find first for found from full gave get gets getting give
+given go goes going gone good got great had hadnt half hard has hasnt have havent having he
+help helped helping helps her here hers herself high him himself his hour hours how however
+i if im in instead into is isnt it its itself ive just keep kept kind knew know last late
+later least left less let like likely little long look looked lot lots low made make many
+may maybe me mean meant might mine minute minutes month months more morning most much must
+my myself near need needed needs never new next night nights no none nor not nothing now of
+off often ok okay old on once one only onto or other others our out over own past per
+perhaps please put quite rather really right said same saw say see seem seemed seems seen
+several she should since so some someone something sometimes soon started still such sure
+take taken takes taking tell than that thats the their them then there these they thing
+things think this those though through thus till time times to today together told tonight
+too took toward tried tries try trying twice two under until up upon us use used using very
+want wanted was wasnt way we week weeks well went were werent what when where whether which
+while who whole why will with within without woke work worked worse worst would wouldnt yes
+yesterday yet you your yours
+once twice three four five six seven eight nine ten eleven twelve hundred
+monday tuesday wednesday thursday friday saturday sunday noon midnight morning afternoon
+"""
+
+# Real words within an edit or two of the red-flag, symptom and drug-name vocabulary
+_NEAR_VOCABULARY = """
+canker cancers candle banner manner answer dancer lancer
+painting paint painted paints paid pair pairs pan pin pine main gain rain vain plain slain
+train brain spain chain stain saint faint fainted painful painless
+confusing confused confuse confuses diffusion fusion contusion conclusion
+strike strikes striking stoke stoked stork struck stroked strokes broke smoke spoke
+chess chase cheat cheese chests crest
+heard hear hearth heat heats hears hurt hurts hurting heartbeat hearty
+attach attached attacks stack tack
+block blocks slack blank blacks lack bleak
+flood floods blond bloody bloom brood
+breathe breathes breathed bread broth wreath breadth
+breaking bleaching brushing
+severe several sever revere severely
+site sites wide aside ride sides said slide tide
+tools tool stool spools stole stoves
+thought though thorough thoughtful throughs
+vomits vomited vomiting
+weakens weakened meekness
+numb numbly dumbness
+difficult
+bone done gone tone lone none once
+gums gum gummy tummy tum sums sum turns rums hums
+avail anvil devil april
+boning bovine
+motions lotion notion potion emotion option
+drowse browse dowdy
+carbonated
+digestion suggestion question
+acres ashes ache acne acids arid avid
+bank bark pack rack sack buck beck backs
+tough rough couch dough bough coughs coughed coughing
+eyed dyes byes ayes
+fevers fewer never lever
+headaches
+witchy pitchy touchy itch itching itches
+point points joins joined pint
+mucous
+mussel muscled muzzle muscles
+nausea nauseous nauseated
+note none rose hose nosy noise nods lose close nosed noses
+reproductive productive production
+funny sunny bunny running rummy runs
+thickness sickly
+freezing squeezing sneering sneeze sneezes
+sure sort some more core bore store score soar sole sorry snore sores
+four hour pour your tour soup soul dour
+strain strained sprains spray sprang
+threat thread throne throw throats
+"""
+
+# Body parts and everyday complaints that are not catalog terms
+_HEALTH = """
+ankle arm arms belly bladder bleeding blister bloated body bowel bruise bruised burn burned
+burning calf cheek chin cold colds cough cramp cramps cut diarrhea dizzy dizziness ear
+earache ears elbow eye face feet finger fingers flu foot forehead gut hand hands head hip
+hips itchy jaw kidney knee knees leg legs lip lips liver lung lungs migraine mouth neck
+nose period rash ribs shoulder shoulders sinus skin sleep sleepy sleeping sneezing stiff
+sunburn swelling swollen teeth temple thigh throat tired toe toes tongue tooth tummy
+upset wrist
+medicine medication meds pill pills tablet tablets capsule capsules dose doses dosage
+drink drank water food meal meals ate eating
+"""
+
+COMMON_WORDS: FrozenSet[str] = frozenset((_GENERAL + _NEAR_VOCABULARY + _HEALTH).split())
@@ -0,0 +1,159 @@
+# local_model.py
+"""
+Small local drug-choice model distilled from logged AI pharmacist decisions.
+
+    python local_model.py train ai_decisions.jsonl -o local_model.json
+
+Each log line is {"request": {...UserRequest payload...}, "drug_key": "..."}, as written
+by log_decision() when AI_DECISION_LOG is set. The model is a multinomial logistic
+regression over sparse symptom / condition / allergy / notes / age / pain features,
+trained and served in pure Python.
+"""
+import argparse
+import json
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+MODEL_VERSION = 1
+_WORD_RE = re.compile(r"[a-z]+")
+_log_lock = threading.Lock()
+
+
+def _age_bucket(age: Optional[int]) -> str:
+    if age is None: return "unknown"
+    if age < 12: return "child"
+    if age < 18: return "teen"
+    if age < 65: return "adult"
+    return "senior"
+
+def _pain_bucket(pain: Optional[int]) -> str:
+    if pain is None: return "unknown"
+    if pain <= 3: return "low"
+    if pain <= 6: return "mid"
+    return "high"
+
+def extract_features(payload: Dict[str, Any]) -> List[str]:
+    """Sparse binary features for one request payload."""
+    feats = {"bias"}
+    for field, prefix in (("symptoms", "sym"), ("conditions", "cond"), ("allergies", "allergy")):
+        for item in payload.get(field) or []:
+            text = (item or "").strip().lower()
+            if not text: continue
+            feats.add(f"{prefix}:{text}")
+            feats.update(f"{prefix}_w:{w}" for w in _WORD_RE.findall(text))
+    feats.update(f"note:{w}" for w in _WORD_RE.findall((payload.get("notes") or "").lower()) if len(w) > 2)
+    feats.add(f"age:{_age_bucket(payload.get('age'))}")
+    feats.add(f"pain:{_pain_bucket(payload.get('pain_level'))}")
+    return sorted(feats)
+
+
+class LocalDecisionModel:
+    def __init__(self, classes: List[str], weights: Dict[str, List[float]]):
+        self.classes = classes
+        self.weights = weights
+
+    def predict_proba(self, payload: Dict[str, Any]) -> List[float]:
+        logits = [0.0] * len(self.classes)
+        for f in extract_features(payload):
+            w = self.weights.get(f)
+            if w is None: continue
+            for i, v in enumerate(w):
+                logits[i] += v
+        return _softmax(logits)
+
+    def predict(self, payload: Dict[str, Any]) -> Tuple[Optional[str], float]:
+        """Most likely drug_key and its probability."""
+        if not self.classes:
+            return None, 0.0
+        probs = self.predict_proba(payload)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": MODEL_VERSION, "classes": self.classes, "weights": self.weights}
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "LocalDecisionModel":
+        with open(path) as fh:
+            data = json.load(fh)
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Unsupported local model version: {data.get('version')}")
+        return cls(data["classes"], data["weights"])
+
+
+def _softmax(logits: List[float]) -> List[float]:
+    top = max(logits)
+    exps = [math.exp(x - top) for x in logits]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+def train(examples: List[Tuple[Dict[str, Any], str]], epochs: int = 30, lr: float = 0.5, l2: float = 1e-4) -> LocalDecisionModel:
+    """Fit the model with plain SGD on (request payload, drug_key) pairs."""
+    classes = sorted({label for _, label in examples})
+    index = {c: i for i, c in enumerate(classes)}
+    model = LocalDecisionModel(classes, {})
+    rows = [(extract_features(p), index[label]) for p, label in examples]
+    for epoch in range(epochs):
+        step = lr / (1.0 + epoch)
+        for feats, target in rows:
+            logits = [0.0] * len(classes)
+            for f in feats:
+                w = model.weights.setdefault(f, [0.0] * len(classes))
+                for i, v in enumerate(w):
+                    logits[i] += v
+            probs = _softmax(logits)
+            for f in feats:
+                w = model.weights[f]
+                for i in range(len(classes)):
+                    grad = probs[i] - (1.0 if i == target else 0.0)
+                    w[i] -= step * (grad + l2 * w[i])
+    return model
+
+def read_decision_log(path: str) -> List[Tuple[Dict[str, Any], str]]:
+    examples = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line: continue
+            rec = json.loads(line)
+            if rec.get("drug_key") and isinstance(rec.get("request"), dict):
+                examples.append((rec["request"], rec["drug_key"]))
+    return examples
+
+def log_decision(path: str, payload: Dict[str, Any], drug_key: str) -> None:
+    """Append one (request, AI-selected drug_key) pair to the decision log."""
+    line = json.dumps({"request": payload, "drug_key": drug_key}, separators=(",", ":"))
+    with _log_lock, open(path, "a") as fh:
+        fh.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the local AbsorpGen decision model from logged AI choices")
+    sub = parser.add_subparsers(dest="command", required=True)
+    t = sub.add_parser("train", help="fit a model from a JSONL decision log")
+    t.add_argument("log", help="JSONL file written via AI_DECISION_LOG")
+    t.add_argument("-o", "--out", default="local_model.json")
+    t.add_argument("--epochs", type=int, default=30)
+    t.add_argument("--lr", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    examples = read_decision_log(args.log)
+    if not examples:
+        print(f"No usable decisions in {args.log}")
+        return 1
+    model = train(examples, epochs=args.epochs, lr=args.lr)
+    correct = sum(1 for p, label in examples if model.predict(p)[0] == label)
+    model.save(args.out)
+    print(f"Trained on {len(examples)} decisions, {len(model.classes)} classes, "
+          f"training accuracy {correct / len(examples):.1%} -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
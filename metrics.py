@@ -0,0 +1,22 @@
+# metrics.py
+import threading
+from collections import Counter
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def incr(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] += n
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+
+def ratio(num: str, den: str) -> float:
+    counts = snapshot()
+    return counts.get(num, 0) / counts[den] if counts.get(den) else 0.0
@@ -1,13 +1,22 @@
 # openai_client.py
 import os
 import json
+import asyncio
+import threading
+import weakref
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
 load_dotenv()  # loads .env if present
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from catalog_records import CatalogRecord, compile_catalog
+from otc_catalog import OTC, OTC_ORDER
 _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# AsyncOpenAI's connection pool is bound to the event loop it was first used on, so async
+# calls use one client per loop (deadlines.run_cancellable runs them all on one loop)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
@@ -71,8 +80,18 @@ MEDICATION_SCHEMA = {
     "required": ["selected_medication", "dosing", "safety_validation"]
 }
 
+# One prompt line per catalog entry, so the prompt can be limited to a shortlist
+def medication_line(record: CatalogRecord) -> str:
+    """e.g. "- Ibuprofen (Advil, Motrin): muscle aches, joint pain; every 6–8 hours ...; avoid with: ulcer, kidney"."""
+    line = f"- {record.generic} ({', '.join(record.brands)}): {', '.join(record.symptoms)}; {record.frequency_label}"
+    if record.avoid_if:
+        line += f"; avoid with: {', '.join(record.avoid_if)}"
+    return line
+
+MEDICATION_LINES = {key: medication_line(record) for key, record in compile_catalog(OTC, OTC_ORDER).items()}
+
 # Enhanced prompt for AI pharmacist role
-AI_PHARMACIST_PROMPT = """You are AbsorpGen AI, an advanced AI pharmacist assistant. Your role is to:
+_PROMPT_HEADER = """You are AbsorpGen AI, an advanced AI pharmacist assistant. Your role is to:
 
 1. SELECT the most appropriate OTC medication based on symptoms, patient factors, and safety
 2. CALCULATE personalized dosing considering age, weight, conditions, and pain level
@@ -80,16 +99,9 @@ AI_PHARMACIST_PROMPT = """You are AbsorpGen AI, an advanced AI pharmacist assist
 4. SUGGEST alternatives when primary choice has concerns
 5. VALIDATE all recommendations against safety standards
 
-You have access to these OTC medications:
-- Acetaminophen (Tylenol): Fever, pain, headache, safe for most patients
-- Ibuprofen (Advil, Motrin): Pain, inflammation, muscle aches, avoid with GI/kidney issues
-- Dextromethorphan (Delsym): Dry cough, avoid with MAOIs
-- Guaifenesin (Mucinex): Productive cough, chest congestion
-- Cetirizine (Zyrtec): Allergies, once daily
-- Loratadine (Claritin): Allergies, once daily
-- Famotidine (Pepcid): Heartburn, acid reflux
-- Meclizine (Dramamine): Nausea, motion sickness
-- Calcium Carbonate (Tums): Heartburn, indigestion
+"""
+
+_PROMPT_RULES = """
 
 SAFETY RULES:
 - Never exceed single-dose caps: Ibuprofen max 600mg, Acetaminophen max 750mg
@@ -100,11 +112,25 @@ SAFETY RULES:
 
 Return ONLY a JSON object matching the provided schema. Be thorough but safe."""
 
-def get_ai_pharmacist_recommendation(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def build_pharmacist_prompt(candidate_keys: Optional[List[str]] = None) -> str:
     """
-    AI pharmacist makes comprehensive medication decisions
-    Returns: Complete medication recommendation with safety validation
+    System prompt listing either the whole catalog or only the rule engine's shortlist
+    (candidate_keys, best first). Unknown keys are ignored.
     """
+    if candidate_keys:
+        lines = [MEDICATION_LINES[k] for k in candidate_keys if k in MEDICATION_LINES]
+    else:
+        lines = []
+    if lines:
+        catalog = "These OTC medications were shortlisted for this patient (best match first):\n" + "\n".join(lines)
+    else:
+        catalog = "You have access to these OTC medications:\n" + "\n".join(MEDICATION_LINES.values())
+    return _PROMPT_HEADER + catalog + _PROMPT_RULES
+
+AI_PHARMACIST_PROMPT = build_pharmacist_prompt()
+SCHEMA_MESSAGE = {"role": "user", "content": f"JSON schema:\n{json.dumps(MEDICATION_SCHEMA)}"}
+
+def build_patient_messages(payload: Dict[str, Any], candidates: Optional[List[str]]) -> List[Dict[str, str]]:
     # Build comprehensive patient context
     patient_context = {
         "demographics": {
@@ -122,27 +148,100 @@ def get_ai_pharmacist_recommendation(payload: Dict[str, Any]) -> Optional[Dict[s
     }
 
     # Ask AI for comprehensive recommendation
-    messages = [
-        {"role": "system", "content": AI_PHARMACIST_PROMPT},
-        {"role": "user", "content": f"JSON schema:\n{json.dumps(MEDICATION_SCHEMA)}"},
+    return [
+        {"role": "system", "content": build_pharmacist_prompt(candidates) if candidates else AI_PHARMACIST_PROMPT},
+        SCHEMA_MESSAGE,
         {"role": "user", "content": f"Patient assessment:\n{json.dumps(patient_context)}"}
     ]
 
+def _compact_reply(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """The decision part of a prior answer; education and alternatives are not needed as context."""
+    return {
+        "selected_medication": {k: rec["selected_medication"].get(k) for k in ("drug_key", "reasoning")},
+        "dosing": {k: rec["dosing"].get(k) for k in ("dose_text", "frequency", "total_mg")},
+        "safety_validation": rec.get("safety_validation", {}),
+    }
+
+def build_followup_messages(base_messages: List[Dict[str, str]], prior_reply: Optional[Dict[str, Any]],
+                            delta: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Follow-up turn of a session: the session's first prompt and assessment unchanged (a
+    stable prefix the API can cache), the previous answer in compact form, then only what
+    changed. The JSON schema is left out; the previous answer already shows the format.
+    """
+    messages = [m for m in base_messages if m != SCHEMA_MESSAGE]
+    if prior_reply:
+        messages.append({"role": "assistant", "content": json.dumps(_compact_reply(prior_reply))})
+    messages.append({"role": "user", "content": f"Follow-up, changes since your last answer:\n{json.dumps(delta)}\n"
+                                                "Return the updated JSON object with selected_medication, dosing and "
+                                                "safety_validation, plus alternatives and patient_education."})
+    return messages
+
+def _completion_kwargs(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    return {
+        "model": OPENAI_MODEL,
+        "messages": messages,
+        "temperature": 0.1,  # Slight creativity for better reasoning
+        "response_format": {"type": "json_object"},
+    }
+
+def _parse_recommendation(text: str) -> Optional[Dict[str, Any]]:
+    data = json.loads(text)
+    # Validate AI response structure
+    if not all(key in data for key in ["selected_medication", "dosing", "safety_validation"]):
+        return None
+    return data
+
+def get_ai_pharmacist_recommendation(payload: Dict[str, Any], candidates: Optional[List[str]] = None,
+                                     timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    AI pharmacist makes comprehensive medication decisions
+    candidates: optional shortlist of drug keys to limit the prompt to
+    timeout: seconds left in the caller's deadline (no retries when set)
+    Returns: Complete medication recommendation with safety validation
+    """
+    messages = build_patient_messages(payload, candidates)
+    client = _client.with_options(timeout=timeout, max_retries=0) if timeout is not None else _client
+
+    try:
+        resp = client.chat.completions.create(**_completion_kwargs(messages))
+        return _parse_recommendation(resp.choices[0].message.content)
+    except Exception as e:
+        print(f"AI pharmacist error: {e}")
+        return None
+
+async def get_ai_pharmacist_recommendation_async(payload: Dict[str, Any], candidates: Optional[List[str]] = None,
+                                                 timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of get_ai_pharmacist_recommendation. Cancelling the awaiting task aborts
+    the outbound HTTP request.
+    """
+    return await _complete_async(build_patient_messages(payload, candidates), timeout)
+
+async def get_ai_pharmacist_followup_async(base_messages: List[Dict[str, str]], prior_reply: Optional[Dict[str, Any]],
+                                           delta: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Session follow-up: continues the prior exchange with only the changed fields (see
+    build_followup_messages) instead of a fresh full assessment.
+    """
+    return await _complete_async(build_followup_messages(base_messages, prior_reply, delta), timeout)
+
+def _loop_client() -> AsyncOpenAI:
+    """The running event loop's AsyncOpenAI client, created on first use."""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return client
+
+async def _complete_async(messages: List[Dict[str, str]], timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+    client = _loop_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)  # shares the loop's connection pool
     try:
-        resp = _client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=messages,
-            temperature=0.1,  # Slight creativity for better reasoning
-            response_format={"type": "json_object"}
-        )
-        text = resp.choices[0].message.content
-        data = json.loads(text)
-        
-        # Validate AI response structure
-        if not all(key in data for key in ["selected_medication", "dosing", "safety_validation"]):
-            return None
-            
-        return data
+        resp = await client.chat.completions.create(**_completion_kwargs(messages))
+        return _parse_recommendation(resp.choices[0].message.content)
     except Exception as e:
         print(f"AI pharmacist error: {e}")
         return None
@@ -10,6 +10,7 @@ OTC = {
     "acetaminophen": {
         "brands": ["Tylenol", "Equate Acetaminophen"],
         "generic": "Acetaminophen",
+        "therapeutic_class": "analgesic", # products in one class are interchangeable for gating
         "form": "tablet",
         "unit_mg": 500,                   # common OTC tablet
         "single_dose_cap_mg": 1000,       # per-dose cap
@@ -23,6 +24,7 @@ OTC = {
     "ibuprofen": {
         "brands": ["Advil", "Motrin"],
         "generic": "Ibuprofen",
+        "therapeutic_class": "nsaid",
         "form": "tablet",
         "unit_mg": 200,
         "single_dose_cap_mg": 800,
@@ -36,6 +38,7 @@ OTC = {
     "dextromethorphan": {
         "brands": ["Delsym", "Robitussin"],
         "generic": "Dextromethorphan",
+        "therapeutic_class": "antitussive",
         "form": "liquid",                 # <- use Delsym liquid to make q12h unambiguous
         "mg_per_ml": 6,                   # Delsym polistirex 30 mg per 5 mL -> 6 mg/mL
         "single_dose_cap_mg": 60,         # Delsym adult dose: 60 mg
@@ -49,6 +52,7 @@ OTC = {
     "guaifenesin": {
         "brands": ["Mucinex", "Robitussin Chest Congestion"],
         "generic": "Guaifenesin",
+        "therapeutic_class": "expectorant",
         "form": "tablet",
         "unit_mg": 200,
         "single_dose_cap_mg": 600,
@@ -62,6 +66,7 @@ OTC = {
     "cetirizine": {
         "brands": ["Zyrtec"],
         "generic": "Cetirizine",
+        "therapeutic_class": "antihistamine",
         "form": "tablet",
         "unit_mg": 10,
         "single_dose_cap_mg": 10,
@@ -75,6 +80,7 @@ OTC = {
     "loratadine": {
         "brands": ["Claritin"],
         "generic": "Loratadine",
+        "therapeutic_class": "antihistamine",
         "form": "tablet",
         "unit_mg": 10,
         "single_dose_cap_mg": 10,
@@ -88,6 +94,7 @@ OTC = {
     "famotidine": {
         "brands": ["Pepcid"],
         "generic": "Famotidine",
+        "therapeutic_class": "acid_reducer",
         "form": "tablet",
         "unit_mg": 10,
         "single_dose_cap_mg": 20,
@@ -101,6 +108,7 @@ OTC = {
     "meclizine": {
         "brands": ["Dramamine Less Drowsy", "Bonine"],
         "generic": "Meclizine",
+        "therapeutic_class": "antiemetic",
         "form": "tablet",
         "unit_mg": 25,
         "single_dose_cap_mg": 25,
@@ -114,6 +122,7 @@ OTC = {
     "calcium_carbonate": {
         "brands": ["Tums"],
         "generic": "Calcium Carbonate",
+        "therapeutic_class": "acid_reducer",
         "form": "tablet",
         "unit_mg": 500,
         "single_dose_cap_mg": 1000,
@@ -0,0 +1,157 @@
+# otc_ranking.py
+import heapq
+
+from catalog_records import CatalogRecord
+from fuzzy_match import FuzzyMatcher, tokenize
+from lexicon import COMMON_WORDS
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class RankedCandidate(NamedTuple):
+    key: str
+    score: int
+
+
+class Ranking(NamedTuple):
+    shortlist: List[RankedCandidate]
+    margin: int  # lead of the winner over the best product of a different therapeutic class
+
+
+class _PhraseStems:
+    """
+    Finds catalog phrases in a word list the way a substring test would: a phrase's last
+    word may begin a longer word ("cough" in "coughing", "tylenol" in "tylenols"), the other
+    words must match whole words, and a phrase must start at the beginning of a word.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = set(phrases)
+        self.max_words = max((len(p.split()) for p in self.phrases), default=1)
+        self.last_words = {p.split()[-1] for p in self.phrases}
+        self.last_word_prefixes = {w[:end] for w in self.last_words for end in range(1, len(w) + 1)}
+
+    def _stems(self, word: str) -> List[str]:
+        """Phrase last words that word starts with ("cough" for "coughing")."""
+        stems = []
+        for end in range(1, len(word) + 1):
+            stem = word[:end]
+            if stem not in self.last_word_prefixes:
+                break
+            if stem in self.last_words:
+                stems.append(stem)
+        return stems
+
+    def find(self, words: List[str]) -> Set[str]:
+        found = set()
+        for j, word in enumerate(words):
+            stems = self._stems(word)
+            if not stems:
+                continue
+            for n in range(min(self.max_words, j + 1)):
+                head = " ".join(words[j - n:j] + [""])
+                for stem in stems:
+                    phrase = head + stem
+                    if phrase in self.phrases:
+                        found.add(phrase)
+        return found
+
+
+class CatalogIndex:
+    """
+    Inverted index over the OTC catalog.
+
+    Postings are built once from the compiled catalog records; a request only touches the postings for
+    the phrases it actually contains, so ranking cost depends on the request and the
+    number of matching products, not on the size of the catalog.
+    """
+
+    def __init__(self, records: Dict[str, CatalogRecord]):
+        """records: compiled catalog (see catalog_records.compile_catalog), in catalog order."""
+        self.order = {key: i for i, key in enumerate(records)}
+        # products without a therapeutic_class only compete with themselves (compile_record)
+        self.classes = {key: rec.therapeutic_class for key, rec in records.items()}
+        # symptom phrase -> [(drug_key, weight)]
+        self.symptom_postings: Dict[str, List[Tuple[str, int]]] = {}
+        # generic / brand name -> {drug_key}   (allergy exclusions)
+        self.name_postings: Dict[str, Set[str]] = {}
+        # contraindication term -> {drug_key}  (avoid_if exclusions)
+        self.avoid_postings: Dict[str, Set[str]] = {}
+
+        for key, rec in records.items():
+            for kw in dict.fromkeys(s.lower() for s in rec.symptoms):
+                self.symptom_postings.setdefault(kw, []).append((key, 1))
+            for name in (rec.generic_lower, *rec.brands_lower):
+                self.name_postings.setdefault(" ".join(tokenize(name)), set()).add(key)
+            for term in rec.avoid_if:
+                self.avoid_postings.setdefault(term.lower(), set()).add(key)
+
+        # misspelt request words are corrected to catalog symptom words before lookup
+        self.symptom_matcher = FuzzyMatcher(self.symptom_postings, known_words=COMMON_WORDS)
+        self._symptom_stems = _PhraseStems(self.symptom_postings)
+        self._name_stems = _PhraseStems(self.name_postings)
+
+    def excluded(self, allergies: Optional[List[str]], conditions: Optional[List[str]]) -> Set[str]:
+        """Products ruled out by allergies (by generic/brand name) or by contraindicated conditions."""
+        out: Set[str] = set()
+        # free text such as "Tylenol.", "tylenol/advil" or "advil, motrin": punctuation
+        # separates words, and a name may begin a longer word ("tylenols")
+        for name in self._name_stems.find(tokenize(" ".join(allergies or []))):
+            out.update(self.name_postings[name])
+        # avoid_if terms are stems ("pregnan", "renal"), so they are matched as substrings;
+        # this scales with the contraindication vocabulary, not with the number of products
+        c = " ".join(conditions or []).lower()
+        if c:
+            for term, keys in self.avoid_postings.items():
+                if term in c:
+                    out.update(keys)
+        return out
+
+    def first_available(self, excluded: Set[str]) -> Optional[str]:
+        for key in self.order:
+            if key not in excluded:
+                return key
+        return None
+
+    def symptom_terms(self, text: str) -> Set[str]:
+        """
+        Catalog symptoms present in text, after typo correction. As with a substring test, a
+        symptom's last word may begin a longer word ("dry cough" in "dry coughing"); see _PhraseStems.
+        """
+        return self._symptom_stems.find(self.symptom_matcher.correct_words(text))
+
+    def rank_with_margin(self, symptoms: Optional[List[str]], allergies: Optional[List[str]] = None,
+                         conditions: Optional[List[str]] = None, boosts: Optional[Dict[str, int]] = None,
+                         exclude: Iterable[str] = (), k: int = 3) -> Ranking:
+        """
+        Score products from the postings of the request's symptoms (see symptom_terms) and return the top k.
+        Ties are broken by catalog order. If nothing matches, the first product that is not
+        excluded is returned with a score of 0.
+
+        The margin is the winner's score minus the best score outside its therapeutic class
+        (interchangeable products such as two antihistamines do not make a choice ambiguous).
+        """
+        excluded = self.excluded(allergies, conditions)
+        excluded.update(exclude)
+
+        # the list is matched as one text, as the rule engine always has ("dry", "cough")
+        terms = self.symptom_terms(" ".join(symptoms or []))
+
+        scores: Dict[str, int] = {}
+        for term in terms:
+            for key, weight in self.symptom_postings[term]:
+                if key not in excluded:
+                    scores[key] = scores.get(key, 0) + weight
+        for key, bonus in (boosts or {}).items():
+            if key in self.order and key not in excluded:
+                scores[key] = scores.get(key, 0) + bonus
+
+        if not scores:
+            fallback = self.first_available(excluded)
+            return Ranking([RankedCandidate(fallback, 0)] if fallback else [], 0)
+
+        top = heapq.nsmallest(k, ((-score, self.order[key], key) for key, score in scores.items()))
+        shortlist = [RankedCandidate(key, -neg) for neg, _, key in top]
+        winner = shortlist[0]
+        winner_class = self.classes[winner.key]
+        runner_up = max((score for key, score in scores.items() if self.classes[key] != winner_class), default=0)
+        return Ranking(shortlist, winner.score - max(runner_up, 0))
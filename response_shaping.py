@@ -0,0 +1,120 @@
+# response_shaping.py
+"""
+Response shaping for /recommend: field projection (?fields=drug_name,dosage), a compact
+profile (?profile=compact) that swaps static text for versioned reference ids the client
+fetches once from /references, and negotiated compression of large bodies.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, List, Mapping, Optional
+
+from werkzeug.wrappers import Response
+
+from static_assets import accepted_encodings, brotli
+
+COMPRESS_MIN_BYTES = 1024  # below this, compression costs more than it saves
+# (path in the full response, key it is replaced with in the compact profile)
+REFERENCE_FIELDS = (
+    (("medical_disclaimer",), "medical_disclaimer_ref"),
+    (("side_effects",), "side_effects_ref"),
+    (("dose_basis", "policy"), "policy_ref"),
+)
+
+
+class ReferenceTable:
+    """Static response text keyed by versioned id; bump the id's version when the text changes."""
+
+    def __init__(self):
+        self._texts: Dict[str, str] = {}
+        self._ids: Dict[str, str] = {}
+
+    def add(self, ref_id: str, text: str) -> None:
+        self._texts[ref_id] = text
+        self._ids.setdefault(text, ref_id)
+
+    def ref_for(self, text: Any) -> Optional[str]:
+        return self._ids.get(text) if isinstance(text, str) else None
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(self._texts)
+
+    @property
+    def etag(self) -> str:
+        body = json.dumps(self._texts, sort_keys=True).encode()
+        return '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    return fields or None
+
+def project(data: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Keep only the requested fields; dotted names select nested keys (dose_basis.max_daily_mg)."""
+    out: Dict[str, Any] = {}
+    for field in fields:
+        src, dst = data, out
+        parts = field.split(".")
+        for i, part in enumerate(parts):
+            if not isinstance(src, dict) or part not in src:
+                break
+            if i == len(parts) - 1:
+                dst[part] = src[part]
+            else:
+                src = src[part]
+                dst = dst.setdefault(part, {})
+    return out
+
+def compact(data: Dict[str, Any], refs: ReferenceTable) -> Dict[str, Any]:
+    """
+    Compact profile: static text becomes reference ids, null fields are dropped and the
+    AI block loses what the top level already carries (drug identity, dosing).
+    """
+    out = {k: v for k, v in data.items() if v is not None}
+    if isinstance(out.get("dose_basis"), dict):
+        out["dose_basis"] = dict(out["dose_basis"])
+    for path, ref_key in REFERENCE_FIELDS:
+        parent = out
+        for part in path[:-1]:
+            parent = parent.get(part) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict):
+            continue
+        ref = refs.ref_for(parent.get(path[-1]))
+        if ref:
+            del parent[path[-1]]
+            parent[ref_key] = ref
+    ai = out.get("ai_pharmacist")
+    if isinstance(ai, dict):
+        selected = ai.get("medication_selected") or {}
+        out["ai_pharmacist"] = {k: v for k, v in {
+            "reasoning": selected.get("reasoning"),
+            "safety_notes": selected.get("safety_notes"),
+            "alternatives": ai.get("alternatives") or None,
+            "patient_education": ai.get("patient_education") or None,
+        }.items() if v is not None}
+    return out
+
+def shape(data: Dict[str, Any], args: Mapping[str, str], refs: ReferenceTable) -> Dict[str, Any]:
+    if args.get("profile") == "compact":
+        data = compact(data, refs)
+    fields = parse_fields(args.get("fields"))
+    return project(data, fields) if fields else data
+
+def json_response(data: Any, accept_encoding: Optional[str], status: int = 200) -> Response:
+    """Compact JSON, compressed when the body is large and the client accepts it."""
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    resp = Response(status=status, mimetype="application/json")
+    coding = None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            body, coding = brotli.compress(body, quality=5), "br"
+        elif "gzip" in accepted:
+            body, coding = gzip.compress(body, compresslevel=6), "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
+    if coding:
+        resp.headers["Content-Encoding"] = coding
+    resp.set_data(body)
+    return resp
@@ -1,3 +1,6 @@
+from fuzzy_match import FuzzyMatcher
+from lexicon import COMMON_WORDS
+
 RED_FLAGS = {
     "chest pain",
     "shortness of breath",
@@ -29,6 +32,18 @@ CASUAL_HINTS = {
     "cough",
 }
 
-def has_red_flag(texts: list[str]) -> bool:
+# Built once at import; catches misspellings such as "chest pian" or "shortnes of breath".
+# Single-word flags must be spelt right: "strike", "canker" and "confusing" are real words.
+RED_FLAG_MATCHER = FuzzyMatcher(sorted(RED_FLAGS), known_words=CASUAL_HINTS | COMMON_WORDS,
+                                single_word_typos=False)
+
+def match_red_flags(texts: list[str]) -> list[str]:
+    """Canonical red-flag terms found in texts, exact substrings first, then typo-tolerant matches."""
     corpus = " ".join((t or "").lower() for t in texts)
-    return any(flag in corpus for flag in RED_FLAGS)
\ No newline at end of file
+    exact = [flag for flag in sorted(RED_FLAGS) if flag in corpus]
+    if exact:
+        return exact
+    return [m.term for m in RED_FLAG_MATCHER.find(corpus)]
+
+def has_red_flag(texts: list[str]) -> bool:
+    return bool(match_red_flags(texts))
\ No newline at end of file
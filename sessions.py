@@ -0,0 +1,67 @@
+# sessions.py
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from deadlines import Deadline, DeadlineExceeded
+from intake_timeline import IntakeTimeline
+from validators import SessionDelta, UserRequest
+
+
+class Session:
+    """
+    Server-side state of one patient conversation: the validated profile, the intake
+    timeline, per-stage results (reused while their inputs are unchanged) and the AI
+    exchange that follow-up prompts continue from.
+    """
+
+    def __init__(self, profile: UserRequest, timeline: IntakeTimeline):
+        self.profile = profile
+        self.timeline = timeline
+        self.last_drug_key: Optional[str] = None
+        self.ineffective: Set[str] = set()  # drugs reported as not helping
+        self.ai_messages: Optional[List[Dict[str, str]]] = None  # first full prompt
+        self.ai_reply: Optional[Dict[str, Any]] = None           # latest AI answer
+        self.lock = threading.Lock()  # one request per session at a time
+        self._stages: Dict[str, Tuple[Hashable, Any]] = {}
+
+    @contextmanager
+    def hold(self, deadline: Deadline) -> Iterator[None]:
+        """
+        Hold the session lock, waiting for another request on the session at most until
+        the deadline; raises DeadlineExceeded when it is still busy by then.
+        """
+        if not self.lock.acquire(timeout=deadline.remaining()):
+            raise DeadlineExceeded("session is busy with another request")
+        try:
+            yield
+        finally:
+            self.lock.release()
+
+    def memo(self, stage: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Result of compute() for this stage, recomputed only when key changes."""
+        cached = self._stages.get(stage)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = compute()
+        self._stages[stage] = (key, value)
+        return value
+
+    def apply(self, delta: SessionDelta, notes: str) -> UserRequest:
+        """
+        The profile with a follow-up applied, which also becomes the session's profile.
+        New symptoms are added, resolved ones removed, and the pain level replaced when given.
+        Notes and intake describe only this follow-up.
+        """
+        resolved = {s.lower() for s in delta.resolved_symptoms}
+        symptoms = [s for s in self.profile.symptoms if s.lower() not in resolved]
+        seen = {s.lower() for s in symptoms}
+        for s in delta.symptoms:
+            if s.lower() not in seen and s.lower() not in resolved:
+                seen.add(s.lower())
+                symptoms.append(s)
+        update = {"symptoms": symptoms, "notes": notes, "intake": delta.intake}
+        if delta.pain_level is not None:
+            update["pain_level"] = delta.pain_level
+        self.profile = self.profile.model_copy(update=update)
+        return self.profile
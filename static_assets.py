@@ -0,0 +1,122 @@
+# static_assets.py
+"""
+Precompressed static assets for the SPA.
+
+Everything under the asset folder is read, hashed and compressed once at startup. Requests
+only pick a prebuilt variant: no per-request compression, and ETag/If-None-Match (from the
+content hash) answered from memory.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from werkzeug.wrappers import Response
+
+try:  # brotli is optional; gzip alone is fine
+    import brotli
+except ImportError:
+    brotli = None
+
+REVALIDATE_CACHE = "no-cache"
+# Preferred encodings, best first, with the suffix that keeps their ETags distinct
+ENCODINGS = (("br", "-br"), ("gzip", "-gz"))
+
+
+class Asset(NamedTuple):
+    name: str
+    mimetype: str
+    digest: str
+    variants: Dict[str, bytes]  # content-coding -> body ("identity" is always present)
+
+
+def _compress(data: bytes) -> Dict[str, bytes]:
+    variants = {"identity": data}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        variants["gzip"] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            variants["br"] = br
+    return variants
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Content-codings the client accepts (q > 0) from an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def negotiate(variants: Mapping[str, bytes], accept_encoding: Optional[str]) -> Tuple[str, str]:
+    """(content-coding, etag suffix) of the best prebuilt variant for the client."""
+    accepted = accepted_encodings(accept_encoding)
+    for coding, suffix in ENCODINGS:
+        if coding in variants and (coding in accepted or "*" in accepted):
+            return coding, suffix
+    return "identity", ""
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip() for t in if_none_match.split(","))
+    return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+class AssetStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._by_name: Dict[str, Asset] = {}
+        if os.path.isdir(root):
+            self._load()
+
+    def _load(self) -> None:
+        for dirpath, _, files in os.walk(self.root):
+            for fname in files:
+                path = os.path.join(dirpath, fname)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                with open(path, "rb") as fh:
+                    data = fh.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                self._by_name[name] = Asset(name, mimetype, digest, _compress(data))
+
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+    def lookup(self, path: str) -> Optional[Asset]:
+        return self._by_name.get(path)
+
+    def find_index(self) -> Optional[Asset]:
+        """The SPA entry point, whatever the case of its file name (index.html / Index.html)."""
+        for name, asset in self._by_name.items():
+            if name.lower() == "index.html":
+                return asset
+        return None
+
+    def serve(self, asset: Asset, headers: Mapping[str, str]) -> Response:
+        coding, suffix = negotiate(asset.variants, headers.get("Accept-Encoding"))
+        etag = f'"{asset.digest}{suffix}"'
+        cache = {
+            "ETag": etag,
+            "Cache-Control": REVALIDATE_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(headers.get("If-None-Match"), etag):
+            return Response(status=304, headers=cache)
+        resp = Response(asset.variants[coding], mimetype=asset.mimetype, headers=cache)
+        if coding != "identity":
+            resp.headers["Content-Encoding"] = coding
+        return resp
@@ -0,0 +1,81 @@
+import asyncio
+import socket
+import ssl
+import threading
+import time
+
+import pytest
+
+import openai_client
+from deadlines import Deadline, DeadlineExceeded, ClientDisconnected, client_disconnected, run_cancellable
+
+
+async def _loop_client_after(delay_s: float):
+    await asyncio.sleep(delay_s)
+    return openai_client._loop_client()
+
+
+def _run_in_thread(fn):
+    result = []
+    worker = threading.Thread(target=lambda: result.append(fn()))
+    worker.start()
+    worker.join(5)
+    return result[0]
+
+
+def test_requests_on_any_thread_share_one_loop_and_client():
+    here = run_cancellable(lambda t: _loop_client_after(0), Deadline(1.0))
+    there = _run_in_thread(lambda: run_cancellable(lambda t: _loop_client_after(0), Deadline(1.0)))
+    assert here is there
+
+
+def test_short_lived_request_threads_leave_no_loops_or_clients_behind():
+    run_cancellable(lambda t: _loop_client_after(0), Deadline(1.0))
+    threads_before = threading.active_count()
+    for _ in range(30):  # a thread-per-request server
+        _run_in_thread(lambda: run_cancellable(lambda t: _loop_client_after(0), Deadline(1.0)))
+    assert len(openai_client._async_clients) == 1
+    assert threading.active_count() == threads_before
+
+
+def test_call_is_cancelled_when_the_deadline_passes():
+    cancelled = []
+
+    async def slow(timeout_s):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(DeadlineExceeded):
+        run_cancellable(slow, Deadline(0.05), poll_s=0.01)
+    for _ in range(100):  # the cancellation lands on the background loop
+        if cancelled:
+            break
+        time.sleep(0.01)
+    assert cancelled
+
+
+def test_call_is_cancelled_when_the_client_disconnects():
+    with pytest.raises(ClientDisconnected):
+        run_cancellable(lambda t: asyncio.sleep(5), Deadline(1.0), is_disconnected=lambda: True, poll_s=0.01)
+
+
+def test_disconnect_check_on_plain_sockets():
+    a, b = socket.socketpair()
+    try:
+        assert not client_disconnected({"werkzeug.socket": a})
+        b.close()
+        assert client_disconnected({"werkzeug.socket": a})
+    finally:
+        a.close()
+
+
+def test_disconnect_check_skips_tls_sockets():
+    tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER).wrap_socket(socket.socket(), server_side=True)
+    try:
+        assert not client_disconnected({"werkzeug.socket": tls})
+    finally:
+        tls.close()
+    assert not client_disconnected({})
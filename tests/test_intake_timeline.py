@@ -0,0 +1,103 @@
+import math
+
+from intake_timeline import DAY_S, IntakeTimeline, _DrugDoses
+
+H = 3600.0
+NOW = 1_000_000.0
+
+
+def timeline_with(*doses, drug="acetaminophen"):
+    timeline = IntakeTimeline()
+    for hours_ago, mg in doses:
+        assert timeline.add(drug, mg, NOW - hours_ago * H)
+    return timeline
+
+
+def test_prefix_sums_stay_correct_for_out_of_order_inserts():
+    doses = _DrugDoses()
+    for t, mg in [(10, 1), (30, 2), (20, 4), (5, 8), (30, 16)]:
+        doses.add(t, mg)
+    assert doses.times == [5, 10, 20, 30, 30]
+    assert doses.prefix == [0, 8, 9, 13, 15, 31]
+
+
+def test_mg_between_is_a_half_open_window():
+    doses = _DrugDoses()
+    for t, mg in [(10, 1), (20, 2), (30, 4)]:
+        doses.add(t, mg)
+    assert doses.mg_between(10, 30) == 6   # (10, 30]
+    assert doses.mg_between(0, 10) == 1
+    assert doses.mg_between(30, 40) == 0
+
+
+def test_mg_last_24h_drops_a_dose_exactly_a_day_old():
+    timeline = timeline_with((24, 1000), (23.9, 500), (1, 500))
+    assert timeline.mg_last_24h("acetaminophen", NOW) == 1000
+    assert timeline.mg_last_24h("ibuprofen", NOW) == 0
+
+
+def test_dedup_window_applies_on_both_sides():
+    timeline = IntakeTimeline()
+    assert timeline.add("ibuprofen", 400, NOW, dedup_window_s=H)
+    assert not timeline.add("ibuprofen", 400, NOW + 0.5 * H, dedup_window_s=H)
+    assert not timeline.add("ibuprofen", 400, NOW - H, dedup_window_s=H)
+    assert timeline.add("ibuprofen", 400, NOW - 1.5 * H, dedup_window_s=H)
+    assert timeline.add("acetaminophen", 500, NOW, dedup_window_s=H)  # other drugs are separate
+    assert timeline.mg_last_24h("ibuprofen", NOW + H) == 800
+
+
+def test_last_dose_and_recent_drugs_ignore_later_doses():
+    timeline = timeline_with((30, 500), (2, 500), (-1, 500))
+    timeline.add("ibuprofen", 400, NOW - 25 * H)
+    assert timeline.last_dose("acetaminophen", NOW) == NOW - 2 * H
+    assert timeline.recent_drugs(NOW) == ["acetaminophen"]
+
+
+def test_next_allowed_without_history_is_now():
+    assert IntakeTimeline().next_allowed("acetaminophen", NOW, 6, 3000, 1000) == NOW
+
+
+def test_next_allowed_waits_for_the_dosing_interval():
+    timeline = timeline_with((23, 500), (1, 500))
+    assert timeline.next_allowed("acetaminophen", NOW, 6, 3000, 1000) == NOW + 5 * H
+
+
+def test_next_allowed_waits_for_the_oldest_dose_to_leave_the_24h_window():
+    # interval allows a dose now (last one 8 h ago), but 3000 + 1000 mg would exceed the max
+    timeline = timeline_with((20, 1000), (14, 1000), (8, 1000))
+    assert timeline.next_allowed("acetaminophen", NOW, 6, 3000, 1000) == NOW + 4 * H
+
+
+def test_next_allowed_finds_how_many_doses_must_age_out():
+    # 1000 mg must leave the window: the two 500 mg doses, so the second one decides
+    timeline = timeline_with((22, 500), (21, 500), (3, 2000))
+    assert timeline.next_allowed("acetaminophen", NOW, None, 3000, 1000) == NOW + 3 * H
+
+
+def test_next_allowed_takes_the_later_of_interval_and_daily_max():
+    timeline = timeline_with((23.5, 1000), (12, 1000), (1, 1000))
+    # daily max frees up in 0.5 h, the interval only in 5 h
+    assert timeline.next_allowed("acetaminophen", NOW, 6, 3000, 1000) == NOW + 5 * H
+    # without an interval the daily max alone decides
+    assert timeline.next_allowed("acetaminophen", NOW, None, 3000, 1000) == NOW + 0.5 * H
+
+
+def test_next_allowed_is_never_when_one_dose_exceeds_the_daily_max():
+    timeline = timeline_with((30, 100))
+    assert math.isinf(timeline.next_allowed("acetaminophen", NOW, 6, 500, 1000))
+
+
+def test_next_allowed_counts_only_the_trailing_day():
+    timeline = timeline_with((DAY_S / H + 1, 3000), (7, 1000))
+    assert timeline.next_allowed("acetaminophen", NOW, 6, 3000, 1000) == NOW
+
+
+def test_assumed_amounts_count_toward_limits_and_are_tracked_apart():
+    timeline = IntakeTimeline()
+    timeline.add("acetaminophen", 500, NOW - 8 * H)
+    timeline.add("acetaminophen", 1000, NOW - 3 * H, assumed=True)
+    timeline.add("acetaminophen", 1000, NOW - 30 * H, assumed=True)
+    assert timeline.mg_last_24h("acetaminophen", NOW) == 1500
+    assert timeline.mg_assumed_last_24h("acetaminophen", NOW) == 1000
+    assert not timeline.add("acetaminophen", 1000, NOW - 3 * H, dedup_window_s=H, assumed=True)
+    assert timeline.mg_assumed_last_24h("acetaminophen", NOW) == 1000
@@ -0,0 +1,84 @@
+import pytest
+
+import app_simple
+from local_model import LocalDecisionModel, train
+
+MUSCLE = {"age": 30, "symptoms": ["muscle aches"], "conditions": ["asthma"], "pain_level": 5}
+
+
+def confident_ibuprofen(logit=6.0):
+    """Picks ibuprofen for muscle aches with probability 1 / (1 + e^-logit)."""
+    return LocalDecisionModel(["acetaminophen", "ibuprofen"], {"sym:muscle aches": [0.0, logit]})
+
+
+@pytest.fixture
+def ai_calls(monkeypatch):
+    calls = []
+
+    async def fake_ai(payload, candidates=None, timeout=None):
+        calls.append(payload)
+        return None  # fall back to the rules
+
+    monkeypatch.setattr(app_simple, "get_ai_pharmacist_recommendation_async", fake_ai)
+    return calls
+
+
+def test_trained_model_round_trips_through_save_and_load(tmp_path):
+    examples = [({"symptoms": ["muscle aches"], "age": 30}, "ibuprofen"),
+                ({"symptoms": ["fever"], "age": 30}, "acetaminophen"),
+                ({"symptoms": ["heartburn"], "notes": "burning after meals"}, "famotidine")] * 5
+    model = train(examples, epochs=10)
+    path = tmp_path / "model.json"
+    model.save(str(path))
+    loaded = LocalDecisionModel.load(str(path))
+    assert loaded.classes == model.classes
+    for payload, label in examples[:3]:
+        assert loaded.predict_proba(payload) == pytest.approx(model.predict_proba(payload))
+        assert loaded.predict(payload)[0] == label
+
+
+def test_load_rejects_other_model_versions(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text('{"version": 99, "classes": [], "weights": {}}')
+    with pytest.raises(ValueError):
+        LocalDecisionModel.load(str(path))
+
+
+def test_unsure_predictions_go_to_the_ai(monkeypatch, ai_calls):
+    monkeypatch.setattr(app_simple, "LOCAL_MODEL", confident_ibuprofen(logit=1.0))  # p = 0.73
+    assert app_simple.local_model_choice(MUSCLE) is None
+    resp = app_simple.app.test_client().post("/recommend", json=MUSCLE)
+    assert resp.status_code == 200
+    assert len(ai_calls) == 1
+    assert resp.get_json()["dose_basis"]["decision_source"] == "rules"
+
+
+@pytest.mark.parametrize("blocking", [
+    {"allergies": ["Advil"]},
+    {"conditions": ["kidney disease"]},
+    {"notes": "took advil 2 hours ago"},
+])
+def test_confident_predictions_of_a_blocked_drug_are_rejected(monkeypatch, blocking):
+    monkeypatch.setattr(app_simple, "LOCAL_MODEL", confident_ibuprofen())
+    assert app_simple.local_model_choice(MUSCLE) == "ibuprofen"
+    assert app_simple.local_model_choice({**MUSCLE, **blocking}) is None
+    assert app_simple.local_model_choice(MUSCLE, exclude={"ibuprofen"}) is None
+
+
+def test_local_choice_still_goes_through_dose_validation(monkeypatch, ai_calls):
+    monkeypatch.setattr(app_simple, "LOCAL_MODEL", confident_ibuprofen())
+    validated = []
+    real_validate = app_simple.validate_dose_safety
+
+    def spy(drug_key, suggested_mg, *args):
+        result = real_validate(drug_key, suggested_mg, *args)
+        validated.append((drug_key, result))
+        return result
+
+    monkeypatch.setattr(app_simple, "validate_dose_safety", spy)
+    resp = app_simple.app.test_client().post("/recommend", json={**MUSCLE, "age": 15, "weight_kg": 45})
+    body = resp.get_json()
+    assert body["dose_basis"]["decision_source"] == "local_model"
+    assert not ai_calls
+    assert [key for key, _ in validated] == ["ibuprofen"]
+    assert body["safety_validation"]["validated_dose_mg"] <= 400  # the low-weight cap
@@ -0,0 +1,63 @@
+import pytest
+
+from app_simple import build_intake_timeline, build_timing_advice, detect_recent_medication, parse_intake_notes
+from validators import UserRequest
+
+
+@pytest.mark.parametrize("notes, drug", [
+    ("took tylenl 3 hours ago", "acetaminophen"),
+    ("took advl 2 hours ago", "ibuprofen"),
+    ("had some tums 2 hours ago", "calcium_carbonate"),
+    ("robitussin dm 1 hour ago", "dextromethorphan"),
+])
+def test_drug_aliases_including_typos(notes, drug):
+    assert detect_recent_medication(notes)[0] == drug
+
+
+@pytest.mark.parametrize("notes", [
+    "my gums are sore 2 hours ago",   # gums is not tums
+    "tumms 2 hours ago",              # short aliases must be spelt exactly
+    "motion sickness started 2 hours ago",
+])
+def test_real_words_are_not_read_as_short_aliases(notes):
+    assert detect_recent_medication(notes)[0] is None
+
+
+def test_intake_notes_with_several_drugs():
+    notes = "took ibuprofen 400 mg 2 hours ago, acetaminophen 1000mg 5 hours ago and pepcid 20 mg yesterday"
+    assert parse_intake_notes(notes) == [
+        ("ibuprofen", 400.0, 2), ("acetaminophen", 1000.0, 5), ("famotidine", 20.0, None),
+    ]
+
+
+def test_intake_notes_attach_values_to_the_right_drug():
+    assert parse_intake_notes("3 hours ago I took advil, and tylenol 500 mg 1 hour ago") == [
+        ("ibuprofen", None, 3), ("acetaminophen", 500.0, 1),
+    ]
+    assert parse_intake_notes("advil 400mg at breakfast, tylenol 6 hours ago") == [
+        ("ibuprofen", 400.0, None), ("acetaminophen", None, 6),
+    ]
+
+
+def test_intake_notes_keep_repeated_doses_of_one_drug():
+    assert parse_intake_notes("tylenol 500mg 2 hours ago and tylenol 500mg 8 hours ago") == [
+        ("acetaminophen", 500.0, 2), ("acetaminophen", 500.0, 8),
+    ]
+
+
+def timing_advice(notes, now=1_000_000.0):
+    timeline = build_intake_timeline(UserRequest(symptoms=["headache"], notes=notes), now)
+    return build_timing_advice(notes, timeline, now)
+
+
+def test_timing_advice_does_not_present_an_assumed_amount_as_taken():
+    advice = timing_advice("took tylenol 2 hours ago")
+    assert "about 1000mg" not in advice
+    assert "no amount was given" in advice and "full dose (1000mg)" in advice
+    assert "Wait at least 4 more hour(s)" in advice   # still enforced as a full dose
+
+
+def test_timing_advice_reports_stated_amounts():
+    assert "You have taken about 500mg of Tylenol" in timing_advice("took tylenol 500mg 2 hours ago")
+    mixed = timing_advice("tylenol 500mg 8 hours ago and tylenol 3 hours ago")
+    assert "about 1500mg" in mixed and "assuming a full dose (1000mg) where no amount was given" in mixed
@@ -0,0 +1,16 @@
+from app_simple import CATALOG
+from openai_client import MEDICATION_LINES, build_pharmacist_prompt
+
+
+def test_every_catalog_entry_has_a_prompt_line():
+    assert list(MEDICATION_LINES) == list(CATALOG)
+    assert MEDICATION_LINES["ibuprofen"].startswith("- Ibuprofen (Advil, Motrin): muscle aches, joint pain")
+    assert "avoid with: ulcer" in MEDICATION_LINES["ibuprofen"]
+    assert "avoid with" not in MEDICATION_LINES["acetaminophen"]
+
+
+def test_shortlist_prompt_lists_only_the_candidates_in_order():
+    prompt = build_pharmacist_prompt(["meclizine", "unknown", "calcium_carbonate"])
+    assert MEDICATION_LINES["meclizine"] + "\n" + MEDICATION_LINES["calcium_carbonate"] in prompt
+    assert MEDICATION_LINES["ibuprofen"] not in prompt
+    assert all(line in build_pharmacist_prompt() for line in MEDICATION_LINES.values())
@@ -0,0 +1,51 @@
+import pytest
+
+from catalog_records import compile_catalog
+from otc_catalog import OTC, OTC_ORDER
+from otc_ranking import CatalogIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CatalogIndex(compile_catalog(OTC, OTC_ORDER))
+
+
+def winner(index, symptoms, **kw):
+    return index.rank_with_margin(symptoms, **kw).shortlist[0].key
+
+
+@pytest.mark.parametrize("symptoms", [["cough"], ["coughing"], ["dry coughing"], ["dry", "cough"]])
+def test_cough_variants_match_like_substrings(index, symptoms):
+    assert winner(index, symptoms) == "dextromethorphan"
+
+
+def test_stem_of_multi_word_symptom(index):
+    assert index.symptom_terms("productive coughing") == {"productive cough", "cough"}
+    assert index.symptom_terms("lower back pains") == {"back pain", "pain"}
+
+
+def test_symptom_inside_a_word_is_not_matched(index):
+    # the one difference from plain substring matching
+    assert index.symptom_terms("toothpain") == set()
+
+
+def test_allergy_and_contraindication_exclusions(index):
+    ranking = index.rank_with_margin(["headache", "back pain"], allergies=["Tylenol"], conditions=["pregnant"])
+    assert {c.key for c in ranking.shortlist}.isdisjoint({"acetaminophen", "ibuprofen"})
+
+
+def test_no_match_falls_back_to_first_available(index):
+    ranking = index.rank_with_margin(["tiredness"], exclude={"acetaminophen"})
+    assert ranking.shortlist[0].key == OTC_ORDER[1] and ranking.margin == 0
+
+
+@pytest.mark.parametrize("allergies, excluded", [
+    (["Tylenol."], {"acetaminophen"}),
+    (["tylenol/advil"], {"acetaminophen", "ibuprofen"}),
+    (["advil, motrin"], {"ibuprofen"}),
+    (["Zyrtec; claritin!"], {"cetirizine", "loratadine"}),
+    (["tylenols"], {"acetaminophen"}),
+    (["penicillin"], set()),
+])
+def test_punctuated_allergies_are_excluded(index, allergies, excluded):
+    assert index.excluded(allergies, None) == excluded
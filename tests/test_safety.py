@@ -0,0 +1,32 @@
+import pytest
+
+from safety import has_red_flag, match_red_flags
+
+
+@pytest.mark.parametrize("text, flag", [
+    ("chest pian since this morning", "chest pain"),
+    ("shortnes of breath when walking", "shortness of breath"),
+    ("I think it's a hart atack", "heart attack"),
+    ("difficulty breathng", "difficulty breathing"),
+    ("numbness in my left arm", "numbness"),
+    ("my dad had a stroke", "stroke"),
+])
+def test_red_flags_are_caught_including_typos_in_phrases(text, flag):
+    assert flag in match_red_flags([text])
+
+
+@pytest.mark.parametrize("text", [
+    "canker sore on my lip",
+    "back pain from painting the fence",
+    "the dosing label is confusing",
+    "a bee sting, no strike",
+    "sore throat and runny nose",
+    "black tools",
+])
+def test_real_words_are_not_corrected_into_red_flags(text):
+    assert match_red_flags([text]) == []
+
+
+def test_single_word_red_flags_need_exact_spelling():
+    assert not has_red_flag(["confusoin"])
+    assert has_red_flag(["some confusion"])
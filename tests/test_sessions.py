@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+import app_simple
+from deadlines import Deadline, DeadlineExceeded
+from sessions import Session
+from validators import UserRequest
+
+PROFILE = {"age": 30, "symptoms": ["headache"], "pain_level": 4}
+
+
+@pytest.fixture
+def client():
+    return app_simple.app.test_client()
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Stops /recommend before the rule engine and AI; records the timeline it was given."""
+    seen = {}
+
+    def fake_build(payload, request_json, timeline, now, deadline, session=None, ai_delta=None):
+        seen["timeline"] = timeline
+        return {"drug_name": "stub"}
+
+    monkeypatch.setattr(app_simple, "build_recommendation", fake_build)
+    return seen
+
+
+def test_recommend_rejects_session_ids_the_server_did_not_issue(client, captured):
+    resp = client.post("/recommend", json={**PROFILE, "session_id": "picked-by-client"})
+    assert resp.status_code == 404
+    assert "timeline" not in captured
+
+
+def test_recommend_uses_the_issued_sessions_timeline(client, captured):
+    session = Session(UserRequest(**PROFILE), app_simple.IntakeTimeline())
+    app_simple.SESSIONS.set("issued-id", session)
+    try:
+        notes = "took tylenol 500mg 2 hours ago"
+        assert client.post("/recommend", json={**PROFILE, "notes": notes, "session_id": "issued-id"}).status_code == 200
+        assert captured["timeline"] is session.timeline
+        assert session.timeline.recent_drugs(app_simple.time.time()) == ["acetaminophen"]
+    finally:
+        app_simple.SESSIONS.pop("issued-id")
+
+
+def test_recommend_without_session_gets_a_fresh_timeline(client, captured):
+    assert client.post("/recommend", json=PROFILE).status_code == 200
+    assert captured["timeline"].recent_drugs(app_simple.time.time()) == []
+
+
+@pytest.mark.parametrize("notes", [
+    "I took it 2 hours ago",
+    "taken about 3 hrs back",
+    "it didn't help at all",
+])
+def test_notes_about_a_dose_refer_to_the_last_drug(notes):
+    assert app_simple.session_notes(notes, "acetaminophen") == f"Acetaminophen: {notes}"
+
+
+@pytest.mark.parametrize("notes", [
+    "my throat feels a bit better",
+    "also a runny nose since this morning",
+    "took advil 2 hours ago",          # names its own drug
+])
+def test_other_notes_are_left_alone(notes):
+    assert app_simple.session_notes(notes, "acetaminophen") == notes
+
+
+def test_busy_session_gives_up_at_the_deadline():
+    session = Session(UserRequest(**PROFILE), app_simple.IntakeTimeline())
+    with session.hold(Deadline(1.0)):
+        waiter = {}
+
+        def second_request():
+            try:
+                with session.hold(Deadline(0.05)):
+                    waiter["got"] = True
+            except DeadlineExceeded:
+                waiter["timed_out"] = True
+
+        t = threading.Thread(target=second_request)
+        t.start()
+        t.join(5)
+    assert waiter == {"timed_out": True}
+    with session.hold(Deadline(0.05)):  # released again afterwards
+        pass
+
+
+def test_followup_on_a_busy_session_returns_504(client):
+    session = Session(UserRequest(**PROFILE), app_simple.IntakeTimeline())
+    app_simple.SESSIONS.set("busy-id", session)
+    try:
+        with session.hold(Deadline(1.0)):
+            resp = client.post("/sessions/busy-id/followup", json={"pain_level": 3},
+                               headers={"X-Request-Timeout-Ms": "50"})
+        assert resp.status_code == 504
+    finally:
+        app_simple.SESSIONS.pop("busy-id")
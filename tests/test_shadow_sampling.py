@@ -0,0 +1,36 @@
+import threading
+
+import app_simple
+import metrics
+
+
+def test_shadow_samples_are_dropped_when_all_slots_are_busy(monkeypatch):
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def slow_check(request_json, candidates, rule_key):
+        started.release()
+        release.wait(5)
+
+    monkeypatch.setattr(app_simple, "_shadow_ai_check", slow_check)
+    dropped = metrics.snapshot().get("ai_shadow_dropped", 0)
+    try:
+        for _ in range(app_simple.AI_SHADOW_MAX_IN_FLIGHT):
+            assert app_simple.submit_shadow_ai_check({}, None, "acetaminophen")
+        assert not app_simple.submit_shadow_ai_check({}, None, "acetaminophen")
+        assert metrics.snapshot().get("ai_shadow_dropped", 0) == dropped + 1
+    finally:
+        release.set()
+    for _ in range(app_simple.AI_SHADOW_MAX_IN_FLIGHT):
+        assert started.acquire(timeout=5)
+
+
+def test_shadow_slot_is_freed_when_a_check_finishes(monkeypatch):
+    done = threading.Event()
+    monkeypatch.setattr(app_simple, "_shadow_ai_check", lambda *args: done.set())
+    assert app_simple.submit_shadow_ai_check({}, None, "acetaminophen")
+    assert done.wait(5)
+    for _ in range(app_simple.AI_SHADOW_MAX_IN_FLIGHT):
+        assert app_simple._SHADOW_SLOTS.acquire(timeout=5)
+    for _ in range(app_simple.AI_SHADOW_MAX_IN_FLIGHT):
+        app_simple._SHADOW_SLOTS.release()
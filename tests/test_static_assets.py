@@ -0,0 +1,26 @@
+import pytest
+
+import app_simple
+
+
+@pytest.fixture
+def client():
+    return app_simple.app.test_client()
+
+
+def test_existing_assets_are_served_precompressed(client):
+    resp = client.get("/Index.html", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert client.get("/Index.html", headers={"If-None-Match": resp.headers["ETag"],
+                                              "Accept-Encoding": "gzip"}).status_code == 304
+
+
+def test_unknown_paths_are_not_found(client):
+    assert client.get("/missing.js").status_code == 404
+    assert client.get("/public/Index.html").status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/recommend", "/sessions", "/sessions/some-id/followup"])
+def test_get_on_api_routes_is_method_not_allowed(client, path):
+    assert client.get(path).status_code == 405
@@ -1,6 +1,12 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
+class IntakeEntry(BaseModel):
+    drug: str                                          # drug key, generic or brand name
+    mg: Optional[float] = Field(default=None, ge=0)    # unknown -> the drug's single-dose cap
+    taken_at: datetime                                 # naive times are treated as UTC
+
 class UserRequest(BaseModel):
     age: Optional[int] = Field(default=None, ge=0, le=120)
     weight_kg: Optional[float] = Field(default=None, ge=1, le=400)
@@ -11,6 +17,15 @@ class UserRequest(BaseModel):
     symptoms: List[str]
     allergies: List[str] = []
     conditions: List[str] = []
+    intake: List[IntakeEntry] = []  # structured recent doses; notes are parsed when empty
+    session_id: Optional[str] = Field(default=None, max_length=128)  # from POST /sessions: use its intake history
+
+class SessionDelta(BaseModel):
+    symptoms: List[str] = []            # new symptoms, added to the session's
+    resolved_symptoms: List[str] = []   # symptoms that went away
+    pain_level: Optional[int] = Field(default=None, ge=0, le=10)
+    notes: Optional[str] = None         # e.g. "I took it 2 hours ago and it didn't help"
+    intake: List[IntakeEntry] = []
 
 class AIRecommendation(BaseModel):
     drug_name: str
@@ -21,6 +36,7 @@ class AIRecommendation(BaseModel):
 class AITriage(BaseModel):
     triage_alert: str
     message: str
+    matched_terms: Optional[List[str]] = None  # red-flag terms that triggered triage
 
 class APIError(BaseModel):
     error: str